@@ -1,5 +1,25 @@
 #CROWDED CAMPUS Q1
-def crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction):
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+import hashlib
+import heapq
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only the vectorized path needs it
+    np = None
+
+# class times are one of 20 time slots, 0 to 19
+TIME_SLOTS = 20
+
+
+def crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction, engine="dinic", aggregate=False,
+                  phase2="repair", warm_start=True, precheck=True, decompose=False, workers=0, vectorized=False,
+                  cache=None, stats=None):
     """
         Approach description :
         There are two problems we have to solve: 
@@ -8,7 +28,7 @@ def crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction):
 
         So there are two phases to solve each problem, 
         Phase 1 is for the first:
-        Based on the proposed classes available we connect students to their top 5 classes and try to allocate as many as we can without breaking any max cap. We do this by running ford fulkerson to find max flow on a space efficient bipartite graph. It’ll tell us the max satisfied students possible. 
+        Based on the proposed classes available we connect students to their top 5 classes and try to allocate as many as we can without breaking any max cap. We do this by running a max flow engine (dinic by default, or ford fulkerson with dfs or bfs) on a space efficient bipartite graph. It’ll tell us the max satisfied students possible. 
 
         check no. of satisfied >= min satisfied, since it'll only get lower from here
 
@@ -32,23 +52,53 @@ def crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction):
         argv3: timePreferences - list of lists, each sublist contains the preferred class times for each student
         argv4: proposedClasses - list of lists, each list contains (class time, min capacity, max capacity) for each class
         argv5: minimumSatisfaction - minimum number of students that must be satisfied with their class allocation
+        argv6: engine - which max flow engine phase 1 uses, a key of MAX_FLOW_ENGINES ("dinic", "dfs" or "bfs")
+        argv7: aggregate - if True phase 1 runs on the compressed network where students with the same top 5 slots
+        share one node (see match_preferred_classes_aggregated)
+        argv8: phase2 - "repair" runs max flow then the min capacity repair below, "circulation" instead solves
+        min/max capacities and satisfaction together as a min cost flow with lower bounds (see allocate_max_satisfaction),
+        which always finds an allocation when one exists. engine and warm_start only apply to "repair" and are
+        ignored otherwise, aggregate, decompose, workers, vectorized and cache raise ValueError with "circulation"
+        argv9: warm_start - seed phase 1 with a greedy matching before the max flow engine runs (see greedy_seed)
+        argv10: precheck - before any flow network is built, reject instances whose satisfaction upper bound 
+        (see satisfaction_upper_bound) is below minimumSatisfaction
+        argv11: decompose - solve phase 1 separately on each connected component of the student - class graph
+        (see match_preferred_classes_decomposed)
+        argv12: workers - with decompose, solve the components in this many worker processes, 0 for none
+        argv13: vectorized - build the phase 1 network and read the allocation back with numpy (numpy must be
+        installed), can't be combined with aggregate or decompose
+        argv14: cache - optional Phase1Cache, phase 1 is looked up there first and stored after solving, so 
+        scenarios that only change minimumSatisfaction or min capacities skip the max flow
+        argv15: stats - optional SolveStats, filled with per phase wall times and the solver counters, the return 
+        value doesn't change
         :Output, return or postcondition: List of allocation for students based on index, or None
-        :Time complexity: O(n^2)
+        :Time complexity: O(n*sqrt(n)) with the default dinic engine, O(n^2) with the dfs or bfs engines
         :Time complexity analysis: 
         For both complexities the most important thing to understand is the lowest min capacity for classes is 1, a class must have at least 1 student. 
         So if we check for this, the most number of classes is n, where we have to assign a single student to each class. 
         
-        based on this, our main time complexity is from our ford fulkerson function, which is O(n^2), and 
-        any loops where we check each student against each class would also be O(n^2)
+        building the network is O(n + m + E) since students are only connected through the classes in their 5 slots, 
+        based on this, our max flow is O(n*sqrt(n)) with dinic (O(n^2) with the dfs or bfs engines), and 
+        the phase 2 repair is O(n + m + S log m) where S is the number of students sacrificed (see repair_min_capacity), 
+        so the max flow engine decides the overall bound
         :Space complexity: O(n)
         :Space complexity analysis:
-        The bipartite graph and the residual graph are the most space consuming. The bigger of the two the residual, in the worst case,
-        holds n edges froms source to students, 
-        5n edges from students to their 5 preferred classes and n reverse edges to source
-        n edges from classes to sink. 
+        The flow network is the most space consuming, its built once and the max flow engine turns it into the residual graph 
+        in place. In the worst case, it holds n edges froms source to students, 
+        5n edges from students to their 5 preferred classes and n edges from classes to sink, each with its reverse edge,
+        stored as a few ints in flat arrays rather than python lists. 
         Overall is boiled down to O(n) space used. 
     """
 
+    if engine not in MAX_FLOW_ENGINES:
+        raise ValueError("unknown max flow engine: %r" % (engine,))
+    if phase2 not in ("repair", "circulation"):
+        raise ValueError("unknown phase 2 mode: %r" % (phase2,))
+    if vectorized and (aggregate or decompose):
+        raise ValueError("vectorized can't be combined with aggregate or decompose")
+    if phase2 == "circulation" and (aggregate or decompose or workers or vectorized or cache is not None):
+        raise ValueError("aggregate, decompose, workers, vectorized and cache only apply to phase 2 \"repair\"")
+
     # Check basic requirements
     total_min_capacity = sum(proposedClasses[j][1] for j in range(m))
     total_max_capacity = sum(proposedClasses[j][2] for j in range(m))
@@ -56,183 +106,1940 @@ def crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction):
         return None  # Not enough students
     if n > total_max_capacity:
         return None  # Too many students
+
+    # Neither phase can satisfy more students than the slot groups have room for
+    if precheck and minimumSatisfaction > 0:
+        started = time.perf_counter()
+        upper_bound = satisfaction_upper_bound(n, m, timePreferences, proposedClasses)
+        if stats is not None:
+            stats.add_phase("precheck", time.perf_counter() - started)
+        if upper_bound < minimumSatisfaction:
+            return None
     
+    if phase2 == "circulation":
+        started = time.perf_counter()
+        result = allocate_max_satisfaction(n, m, timePreferences, proposedClasses)
+        if stats is not None:
+            stats.add_phase("circulation", time.perf_counter() - started)
+        if result is None or result[0] < minimumSatisfaction:
+            return None
+        return result[1]
+
     # PHASE 1: Find maximum satisfied students by matching to preferred classes
+    # allocation of students (to preferred classes), -1 if unmatched
+    phase1_assignments = None
+    if cache is not None:
+        started = time.perf_counter()
+        cache_key = cache.key(n, m, timePreferences, proposedClasses, engine=engine, warm_start=warm_start,
+                              aggregate=aggregate, decompose=decompose)
+        phase1_assignments = cache.get(cache_key)
+        if stats is not None:
+            stats.add_phase("cache", time.perf_counter() - started)
+
+    if phase1_assignments is None:
+        if decompose:
+            phase1_assignments = match_preferred_classes_decomposed(n, m, timePreferences, proposedClasses, engine, warm_start,
+                                                                    aggregate, workers, stats)
+        elif aggregate:
+            phase1_assignments = match_preferred_classes_aggregated(n, m, timePreferences, proposedClasses, engine, warm_start, stats)
+        else:
+            phase1_assignments = match_preferred_classes(n, m, timePreferences, proposedClasses, engine, warm_start, stats,
+                                                         vectorized)
+        if cache is not None:
+            cache.put(cache_key, phase1_assignments)
+
+    satisfied_count = n - phase1_assignments.count(-1)           # Count of satisfied students
+
+    # IF max possible satisfied students is less than minimum satisfaction, return None
+    if satisfied_count < minimumSatisfaction:
+        return None
     
-    # Create space-efficient graph representation
-    # Format: For each node, store list of [neighbor, capacity] lists, space used: O(n)
-    graph = [[] for _ in range(n + m + 2)]
+    #Phase 2 fix any classes with minimum capacity not met
+    started = time.perf_counter()
+    satisfied_count = repair_min_capacity(n, m, timePreferences, proposedClasses, phase1_assignments, satisfied_count, stats)
+    if stats is not None:
+        stats.add_phase("phase2", time.perf_counter() - started)
+    
+    # Final check
+    if satisfied_count < minimumSatisfaction:
+        return None
+        
+    return phase1_assignments
+
+
+def repair_min_capacity(n, m, timePreferences, proposedClasses, assignments, satisfied_count, stats=None):
+    """
+        Function description:
+        Phase 2 of crowdedCampus. Goes through the classes finding ones without enough students and first assigns 
+        unallocated students, if this isnt enough it sacrifices students from classes that can spare them. 
+        Anyone still unallocated at the end goes to any class with room.
+
+        Rather than rescanning every student for every class, the unallocated students wait in one queue and
+        the students phase 1 matched wait in a donor queue per class, both in index order. A class can only 
+        donate while it's above its min capacity, and a class never gains students once it has been repaired,
+        so a heap of the classes with surplus (keyed by the index of their next donor) always gives the lowest 
+        index student who can be moved. The leftovers fill classes in index order, so a single pointer tracks 
+        the first class with room.
+
+        :Input:
+        argv1-4: n, m, timePreferences, proposedClasses - same as crowdedCampus
+        argv5: assignments - class index per student from phase 1, -1 if unmatched, updated in place
+        argv6: satisfied_count - number of students in a class in their top 5 slots
+        argv7: stats - optional SolveStats, counts the students placed and sacrificed
+        :Output, return or postcondition: the satisfied count after the repair, assignments holds a full allocation
+        :Time complexity: O(n + m + S log m)
+        :Time complexity analysis: the queues are built in one pass over the students, then each of the S 
+        sacrifices is a heap pop and maybe a push. Every other move pops a queue and the class pointer only 
+        moves forward
+        :Space complexity: O(n + m)
+        :Space complexity analysis: the queues hold each student once, plus the class counts and the heap
+    """
+    class_counts = [0] * m
+    donors = [[] for _ in range(m)]     # students phase 1 matched, per class, in index order
+    unassigned = deque()                # students phase 1 couldn't match, in index order
+    for i in range(n):
+        class_index = assignments[i]
+        if class_index == -1:
+            unassigned.append(i)
+        else:
+            class_counts[class_index] += 1
+            donors[class_index].append(i)
+
+    # classes above their min capacity, as (next donor, class, position of the next donor in its queue)
+    surplus_heap = [(donors[j][0], j, 0) for j in range(m) if class_counts[j] > proposedClasses[j][1]]
+    heapq.heapify(surplus_heap)
+    unassigned_placed = sacrifices = satisfaction_lost = leftovers_placed = 0
+
+    # Handle minimum capacity constraints
+    for j in range(m):
+        deficit = proposedClasses[j][1] - class_counts[j]
+
+        # First use unassigned students
+        while deficit > 0 and unassigned:
+            assignments[unassigned.popleft()] = j
+            class_counts[j] += 1
+            deficit -= 1
+            unassigned_placed += 1
+
+        # If still deficit, sacrifice satisfied students
+        while deficit > 0 and surplus_heap:
+            i, original_class, position = heapq.heappop(surplus_heap)
+            assignments[i] = j
+            class_counts[j] += 1
+            class_counts[original_class] -= 1
+            deficit -= 1
+            sacrifices += 1
+            # the student only loses satisfaction if class j's time isnt one of their top 5
+            if proposedClasses[j][0] not in timePreferences[i][:5]:
+                satisfied_count -= 1
+                satisfaction_lost += 1
+            position += 1
+            if class_counts[original_class] > proposedClasses[original_class][1]:
+                heapq.heappush(surplus_heap, (donors[original_class][position], original_class, position))
+
+    # Assign any remaining unassigned students to classes with available capacity
+    j = 0
+    while unassigned:
+        while j < m and class_counts[j] >= proposedClasses[j][2]:
+            j += 1
+        if j == m:
+            break
+        assignments[unassigned.popleft()] = j
+        class_counts[j] += 1
+        leftovers_placed += 1
+
+    if stats is not None:
+        stats.add_repair_counts(unassigned_placed, sacrifices, satisfaction_lost, leftovers_placed)
+    return satisfied_count
+
+
+def index_classes_by_slot(m, proposedClasses):
+    """
+        Function description:
+        Groups the class indexes by their time slot, so the classes a student could be happy in are found from 
+        their 5 slots instead of checking every class.
+
+        :Input:
+        argv1: m - number of classes
+        argv2: proposedClasses - list of lists, each list contains (class time, min capacity, max capacity) for each class
+        :Output, return or postcondition: classes_at_slot, list of TIME_SLOTS lists of class indexes
+        :Time complexity: O(m)
+        :Space complexity: O(m)
+    """
+    classes_at_slot = [[] for _ in range(TIME_SLOTS)]
+    for j in range(m):
+        classes_at_slot[proposedClasses[j][0]].append(j)
+    return classes_at_slot
+
+
+def build_campus_network(n, m, timePreferences, proposedClasses):
+    """
+        Function description:
+        Builds the phase 1 flow network, source -> student (capacity 1) -> each class in one of the 
+        student's top 5 slots (capacity 1) -> sink (the class's max capacity). Students are nodes 0 to n-1,
+        class j is node n+j, then the source and the sink.
+
+        :Input: same as crowdedCampus
+        :Output, return or postcondition: (network, source, sink)
+        :Time complexity: O(n + m + E), where E is the number of student to class edges (at most 5n when m is O(n))
+        :Time complexity analysis: the classes are indexed by slot once, O(m), then each student adds the 
+        edges for the classes in their 5 slots, O(n*5 + E), rather than checking every class for every student
+        :Space complexity: O(n + m + E)
+        :Space complexity analysis: one entry per node in head and 2 per edge in the edge arrays
+    """
+    # Create space-efficient flow network, edges live in flat int arrays (see FlowNetwork), space used: O(n)
+    network = FlowNetwork(n + m + 2)
     source = n + m
     sink = n + m + 1
     
     # Connect source to students with capacity 1, O(n)
     for i in range(n):
-        graph[source].append([i, 1])
+        network.add_edge(source, i, 1)
     
-    # Connect students to preferred classes
+    classes_at_slot = index_classes_by_slot(m, proposedClasses)
+
+    # Connect students to preferred classes, only looking at the classes in each of their top 5 slots
     for i in range(n):
-        top_five_slots = timePreferences[i][:5] # the list slice is constant O(5)
-        for j in range(m):
-            if proposedClasses[j][0] in top_five_slots:
+        for slot in timePreferences[i][:5]: # the list slice is constant O(5)
+            for j in classes_at_slot[slot]:
                 # Student i connects to class n+j
-                graph[i].append([n + j, 1])
-                
+                network.add_edge(i, n + j, 1)
         
     # Connect classes to sink
     for j in range(m):
         class_node = n + j
         max_capacity = proposedClasses[j][2]
-        graph[class_node].append([sink, max_capacity])
+        network.add_edge(class_node, sink, max_capacity)
 
-    # Run Ford-Fulkerson to find and allocate max satisfied students
-    phase1_assignments = [-1] * n  # allocation of students (to preferred classes)
-    class_counts = [0] * m        # How many students in each class after
-    satisfied_count = 0           # Count of satisfied students
+    return network, source, sink
 
-    preferredMatches = space_efficient_ford_fulkerson(graph, source, sink)
-    
-    #For every student, check which class they were assigned to
+
+def extract_assignments(network, n):
+    """
+        Function description:
+        Reads the allocation out of a network built by build_campus_network after max flow has run.
+        A student was matched to the class whose edge has no capacity left.
+
+        :Input:
+        argv1: network - FlowNetwork holding the residual graph
+        argv2: n - number of students
+        :Output, return or postcondition: list of class index per student, -1 when unmatched
+        :Time complexity: O(n + E)
+        :Time complexity analysis: each student's edges are walked once at most
+        :Space complexity: O(n)
+    """
+    assignments = [-1] * n
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
     for i in range(n):
-        for edge in preferredMatches[i][:-1]:  # Skip the last edge, since thats the reverse edge to the source
-            if edge[1] == 0:
-                class_index = edge[0] - n 
-                phase1_assignments[i] = class_index
-                class_counts[class_index] += 1
-                satisfied_count += 1
+        e = head[i]
+        while e >= 0:
+            # forward edges (even) out of a student go to classes, a used one has no capacity left.
+            # odd edges are reverse edges, the one back to the source
+            if not e & 1 and cap[e] == 0:
+                assignments[i] = to[e] - n
                 break
+            e = nxt[e]
+    return assignments
 
-    # IF max possible satisfied students is less than minimum satisfaction, return None
-    if satisfied_count < minimumSatisfaction:
+
+def _top_five_matrix(n, timePreferences):
+    """
+    Function description:
+    The students' top 5 slots as an n x 5 numpy array. A campus_loader.TopFivePreferences is already laid out
+    like this, so its buffer is used as is without copying.
+    """
+    buffer = getattr(timePreferences, "buffer", None)
+    if buffer is not None:
+        return np.frombuffer(buffer, dtype=np.uint8, count=5 * n).reshape(n, 5).astype(np.intp)
+    return np.array([timePreferences[i][:5] for i in range(n)], dtype=np.intp).reshape(n, 5)
+
+
+def _int_array(values):
+    """
+    Function description:
+    Copies a numpy array into an array('i') like the ones FlowNetwork keeps.
+    """
+    result = array('i')
+    result.frombytes(np.ascontiguousarray(values, dtype=np.intc).tobytes())
+    return result
+
+
+def build_campus_network_numpy(n, m, timePreferences, proposedClasses):
+    """
+        Function description:
+        Same network as build_campus_network, edge for edge and in the same order, but the edges and the 
+        forward-star lists are made with numpy array operations instead of a python loop per student.
+        The student -> class edges come from repeating each (student, slot) pair once per class in that slot,
+        then the next links come from a stable sort of the edges by tail, so each edge points at the one 
+        added before it out of the same node, as add_edge would have done. Needs numpy.
+
+        :Input: same as crowdedCampus
+        :Output, return or postcondition: (network, source, sink)
+        :Time complexity: O((n + m + E) log(n + m + E))
+        :Time complexity analysis: the sort by tail, everything else is a linear array operation
+        :Space complexity: O(n + m + E)
+        :Space complexity analysis: a few temporary arrays of length 2(n + m + E) besides the network itself
+    """
+    if np is None:
+        raise ImportError("the vectorized path needs numpy")
+    source = n + m
+    sink = n + m + 1
+    top_five = _top_five_matrix(n, timePreferences)
+    classes = np.array([proposedClasses[j] for j in range(m)], dtype=np.intp).reshape(m, 3)
+
+    # the classes grouped by slot (index order inside a slot, like index_classes_by_slot)
+    class_order = np.argsort(classes[:, 0], kind="stable")
+    slot_count = np.bincount(classes[:, 0], minlength=TIME_SLOTS)
+    slot_start = np.cumsum(slot_count) - slot_count
+
+    # one run of edges per (student, slot) pair, one edge for each class in the slot
+    pair_slot = top_five.ravel()
+    run_length = slot_count[pair_slot]
+    total = int(run_length.sum())
+    edge_student = np.repeat(np.repeat(np.arange(n), 5), run_length)
+    run_offset = np.cumsum(run_length) - run_length
+    within_run = np.arange(total) - np.repeat(run_offset, run_length)
+    edge_class = class_order[np.repeat(slot_start[pair_slot], run_length) + within_run]
+
+    # source -> students, students -> classes, classes -> sink, same order as build_campus_network
+    tails = np.concatenate((np.full(n, source), edge_student, n + np.arange(m)))
+    heads = np.concatenate((np.arange(n), n + edge_class, np.full(m, sink)))
+    capacities = np.concatenate((np.ones(n + total, dtype=np.intp), classes[:, 2]))
+
+    # forward edge k is edge 2k, its reverse is 2k + 1
+    edges = 2 * len(tails)
+    edge_tail = np.empty(edges, dtype=np.intp)
+    edge_tail[0::2], edge_tail[1::2] = tails, heads
+    to = np.empty(edges, dtype=np.intp)
+    to[0::2], to[1::2] = heads, tails
+    cap = np.zeros(edges, dtype=np.intp)
+    cap[0::2] = capacities
+
+    # sorted by tail, each edge's next is the edge before it in the same run, head is the last of the run
+    by_tail = np.argsort(edge_tail, kind="stable")
+    sorted_tail = edge_tail[by_tail]
+    nxt = np.full(edges, -1, dtype=np.intp)
+    head = np.full(n + m + 2, -1, dtype=np.intp)
+    if edges:
+        same_tail = sorted_tail[1:] == sorted_tail[:-1]
+        nxt[by_tail[1:][same_tail]] = by_tail[:-1][same_tail]
+        last_of_run = np.append(~same_tail, True)
+        head[sorted_tail[last_of_run]] = by_tail[last_of_run]
+
+    network = FlowNetwork(0)
+    network.total_nodes = n + m + 2
+    network.head, network.next, network.to, network.cap = _int_array(head), _int_array(nxt), _int_array(to), _int_array(cap)
+    return network, source, sink
+
+
+def extract_assignments_numpy(network, n, m):
+    """
+        Function description:
+        Same as extract_assignments with numpy, for a network laid out by build_campus_network (or the numpy
+        version). The student -> class edges are the forward edges after the n source edges and before the
+        m sink edges, the used ones have no capacity left and their reverse edge points back at the student.
+
+        :Output, return or postcondition: list of class index per student, -1 when unmatched
+        :Time complexity: O(n + E)
+        :Space complexity: O(n + E)
+    """
+    if np is None:
+        raise ImportError("the vectorized path needs numpy")
+    to = np.frombuffer(network.to, dtype=np.intc)
+    cap = np.frombuffer(network.cap, dtype=np.intc)
+    student_edges = np.arange(2 * n, len(to) - 2 * m, 2)
+    used = student_edges[cap[student_edges] == 0]
+    assignments = np.full(n, -1, dtype=np.intp)
+    assignments[to[used + 1]] = to[used] - n
+    return assignments.tolist()
+
+
+def match_preferred_classes(n, m, timePreferences, proposedClasses, engine="dinic", warm_start=True, stats=None,
+                            vectorized=False):
+    """
+        Function description:
+        Phase 1 of crowdedCampus, matches as many students as possible to a class in one of their top 5 slots
+        without going over any max capacity, by running max flow on the network from build_campus_network.
+        With warm_start the flow is first seeded by greedy_seed so the engine only has to augment for the 
+        students the greedy pass couldn't place. stats is an optional SolveStats, it gets the "build" and 
+        "phase1" times and the engine's counters. With vectorized the network is built and read back with 
+        numpy (build_campus_network_numpy and extract_assignments_numpy), only the augmenting stays in python.
+
+        :Input: same as crowdedCampus
+        :Output, return or postcondition: list of class index per student, -1 when they couldn't get a preferred class
+        :Time complexity: O(n*sqrt(n)) with dinic, O(n^2) with dfs or bfs
+        :Space complexity: O(n)
+    """
+    started = time.perf_counter()
+    if vectorized:
+        network, source, sink = build_campus_network_numpy(n, m, timePreferences, proposedClasses)
+    else:
+        network, source, sink = build_campus_network(n, m, timePreferences, proposedClasses)
+    built = time.perf_counter()
+    if warm_start:
+        greedy_seed(network, source, sink, stats)
+    MAX_FLOW_ENGINES[engine](network, source, sink, stats)
+    if vectorized:
+        assignments = extract_assignments_numpy(network, n, m)
+    else:
+        assignments = extract_assignments(network, n)
+    if stats is not None:
+        stats.add_phase("build", built - started)
+        stats.add_phase("phase1", time.perf_counter() - built)
+    return assignments
+
+
+def match_preferred_classes_aggregated(n, m, timePreferences, proposedClasses, engine="dinic", warm_start=True,
+                                       stats=None):
+    """
+        Function description:
+        Same result as match_preferred_classes on a compressed network. Students who can be satisfied by exactly
+        the same classes (same top 5 slots, ignoring slots with no class) are interchangeable, so they are 
+        grouped into one node with capacity equal to the group size. Max flow runs once on the group network,
+        then the flow on each group -> class edge is handed out to that many students of the group.
+        stats is an optional SolveStats, same as match_preferred_classes (grouping counts as "build").
+
+        :Input: same as crowdedCampus
+        :Output, return or postcondition: list of class index per student, -1 when they couldn't get a preferred class
+        :Time complexity: O(n + m) plus max flow on G group nodes
+        :Time complexity analysis: grouping is O(n) (sorting 5 slots is constant), the network has G group nodes
+        with G at most C(20,5) = 15504 no matter how many students, so max flow cost no longer grows with n.
+        Expanding back walks each group's edges and members once, O(n + group edges).
+        :Space complexity: O(n + m)
+        :Space complexity analysis: the group member lists hold each student once, the network is O(G + m + group edges)
+    """
+    started = time.perf_counter()
+    classes_at_slot = index_classes_by_slot(m, proposedClasses)
+
+    # Group students by the sorted tuple of their top 5 slots that have classes, O(n)
+    group_of_key = {}
+    group_slots = []
+    group_members = []
+    for i in range(n):
+        key = tuple(sorted(slot for slot in timePreferences[i][:5] if classes_at_slot[slot]))
+        if not key:
+            continue  # no preferred class exists for this student, they can't be matched
+        g = group_of_key.get(key)
+        if g is None:
+            g = len(group_slots)
+            group_of_key[key] = g
+            group_slots.append(key)
+            group_members.append([])
+        group_members[g].append(i)
+
+    # Group g is node g, class j is node groups+j
+    groups = len(group_slots)
+    network = FlowNetwork(groups + m + 2)
+    source = groups + m
+    sink = groups + m + 1
+    group_edges = []
+    for g in range(groups):
+        size = len(group_members[g])
+        network.add_edge(source, g, size)
+        edges = []
+        for slot in group_slots[g]:
+            for j in classes_at_slot[slot]:
+                edges.append((network.add_edge(g, groups + j, size), j))
+        group_edges.append(edges)
+    for j in range(m):
+        network.add_edge(groups + j, sink, proposedClasses[j][2])
+    built = time.perf_counter()
+
+    if warm_start:
+        greedy_seed(network, source, sink, stats)
+    MAX_FLOW_ENGINES[engine](network, source, sink, stats)
+
+    # Expand back, the flow on an edge is how much of its capacity (the group size) was used
+    assignments = [-1] * n
+    cap = network.cap
+    for g in range(groups):
+        members = group_members[g]
+        size = len(members)
+        next_member = 0
+        for e, j in group_edges[g]:
+            for _ in range(size - cap[e]):
+                assignments[members[next_member]] = j
+                next_member += 1
+    if stats is not None:
+        stats.add_phase("build", built - started)
+        stats.add_phase("phase1", time.perf_counter() - built)
+    return assignments
+
+
+def slot_components(n, m, timePreferences, proposedClasses):
+    """
+        Function description:
+        Splits the student - class bipartite graph into connected components. Classes in the same slot always
+        share their students, so it's enough to union the offered slots each student links together (union 
+        find over the 20 slots), then a component is a group of slots with its classes and students.
+        Students with none of their top 5 slots offered are in no component.
+
+        :Input: same as crowdedCampus
+        :Output, return or postcondition: list of (students, classes) index lists, one per component, in order
+        of each component's lowest class index
+        :Time complexity: O(n + m)
+        :Time complexity analysis: each student does at most 4 unions over 20 slots, constant work
+        :Space complexity: O(n + m)
+    """
+    classes_at_slot = index_classes_by_slot(m, proposedClasses)
+    parent = list(range(TIME_SLOTS))
+
+    def find(slot):
+        while parent[slot] != slot:
+            parent[slot] = parent[parent[slot]]
+            slot = parent[slot]
+        return slot
+
+    student_slot = [-1] * n         # one offered slot per student, -1 if none
+    for i in range(n):
+        for slot in timePreferences[i][:5]:
+            if classes_at_slot[slot]:
+                if student_slot[i] < 0:
+                    student_slot[i] = slot
+                else:
+                    parent[find(slot)] = find(student_slot[i])
+
+    component_of_root = {}
+    components = []
+    for j in range(m):
+        root = find(proposedClasses[j][0])
+        c = component_of_root.get(root)
+        if c is None:
+            c = component_of_root[root] = len(components)
+            components.append(([], []))
+        components[c][1].append(j)
+    for i in range(n):
+        if student_slot[i] >= 0:
+            components[component_of_root[find(student_slot[i])]][0].append(i)
+    return components
+
+
+def _match_component(timePreferences, proposedClasses, engine, warm_start, aggregate, stats=None):
+    """
+    Function description:
+    Phase 1 on one component's sub instance, module level so match_preferred_classes_decomposed can send it
+    to a worker process. Returns the component's local class index per student, -1 if unmatched.
+    """
+    match = match_preferred_classes_aggregated if aggregate else match_preferred_classes
+    return match(len(timePreferences), len(proposedClasses), timePreferences, proposedClasses, engine, warm_start, stats)
+
+
+def match_preferred_classes_decomposed(n, m, timePreferences, proposedClasses, engine="dinic", warm_start=True,
+                                       aggregate=False, workers=0, stats=None):
+    """
+        Function description:
+        Same result as match_preferred_classes, but phase 1 runs separately on each connected component from 
+        slot_components (e.g. a morning only cohort and an evening only cohort never compete for a class), 
+        so each max flow works on a smaller network. With workers > 0 the components are solved in a process
+        pool, otherwise one after the other. The component assignments are mapped back to global class 
+        indexes so phase 2 still repairs min capacities over the whole campus.
+        stats is an optional SolveStats, splitting counts as "decompose". In process the components add to 
+        "build" and "phase1" as usual, with workers the whole parallel solve is timed as "phase1".
+
+        :Input:
+        argv1-6: n, m, timePreferences, proposedClasses, engine, warm_start - same as crowdedCampus
+        argv7: aggregate - solve each component with match_preferred_classes_aggregated
+        argv8: workers - worker processes for the components, 0 solves them in this process
+        argv9: stats - optional SolveStats
+        :Output, return or postcondition: list of class index per student, -1 when they couldn't get a preferred class
+        :Time complexity: O(n + m) plus max flow on each component
+        :Space complexity: O(n + m)
+        :Space complexity analysis: the sub instances only copy the students' top 5 slots and the classes once
+    """
+    started = time.perf_counter()
+    components = slot_components(n, m, timePreferences, proposedClasses)
+    sub_instances = []
+    for students, classes in components:
+        sub_preferences = [timePreferences[i][:5] for i in students]
+        sub_classes = [proposedClasses[j] for j in classes]
+        sub_instances.append((sub_preferences, sub_classes))
+    if stats is not None:
+        stats.add_phase("decompose", time.perf_counter() - started)
+
+    if workers > 0 and len(components) > 1:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=min(workers, len(components))) as pool:
+            futures = [pool.submit(_match_component, sub_preferences, sub_classes, engine, warm_start, aggregate)
+                       for sub_preferences, sub_classes in sub_instances]
+            local_assignments = [future.result() for future in futures]
+        if stats is not None:
+            stats.add_phase("phase1", time.perf_counter() - started)
+    else:
+        local_assignments = [_match_component(sub_preferences, sub_classes, engine, warm_start, aggregate, stats)
+                             for sub_preferences, sub_classes in sub_instances]
+
+    assignments = [-1] * n
+    for (students, classes), local in zip(components, local_assignments):
+        for i, j in zip(students, local):
+            if j >= 0:
+                assignments[i] = classes[j]
+    return assignments
+
+
+def allocate_max_satisfaction(n, m, timePreferences, proposedClasses):
+    """
+        Approach description:
+        Solves both phases at once as a min cost flow with lower bounds, rather than max flow then repairing.
+        Every student must get exactly one class and class j must get between its min and max capacity, which is 
+        a flow where source -> student has lower bound 1 and class j -> sink has lower bound min_j. A student can 
+        go straight to a class in their top 5 slots (cost 0) or through an "any class" hub node to any class (cost 1),
+        so the min cost is the least number of unsatisfied students.
+
+        Lower bounds are removed the usual way: an edge (u,v) with lower bound l keeps capacity upper - l, and 
+        v gets l units of supply while u needs l units. A super source gives the supplies (1 to each student, 
+        the sum of min caps to the sink) and a super sink takes the needs (min_j from class j, n from the source,
+        which is joined with the super sink). An allocation exists exactly when the flow saturates every super 
+        source edge, n + sum of min caps.
+
+        :Input:
+        argv1-4: n, m, timePreferences, proposedClasses - same as crowdedCampus
+        :Output, return or postcondition: (satisfied_count, allocation) with the max satisfied count possible, 
+        or None if no allocation meets every min and max capacity
+        :Time complexity: O(D * (n log n + F_d * n)), see min_cost_flow
+        :Time complexity analysis: the network has n + m + 4 nodes and O(n + m) edges (5 per student at most, 
+        1 to the hub per student, 3 per class), D is the number of distinct path costs which is small with 0/1 costs
+        :Space complexity: O(n + m)
+        :Space complexity analysis: the network is O(n + m), so is the allocation
+    """
+    total_min_capacity = sum(proposedClasses[j][1] for j in range(m))
+
+    # students 0..n-1, classes n..n+m-1, then the hub, the sink, the super source and the super sink.
+    # The source is merged with the super sink since all it does is pass on n units
+    network = CostFlowNetwork(n + m + 4)
+    hub = n + m
+    sink = n + m + 1
+    super_source = n + m + 2
+    super_sink = n + m + 3
+
+    classes_at_slot = index_classes_by_slot(m, proposedClasses)
+    for i in range(n):
+        # source -> student is fixed at 1, so the student gets 1 unit of supply
+        network.add_edge(super_source, i, 1)
+        for slot in timePreferences[i][:5]:
+            for j in classes_at_slot[slot]:
+                network.add_edge(i, n + j, 1, 0)
+        network.add_edge(i, hub, 1, 1)
+
+    for j in range(m):
+        min_capacity, max_capacity = proposedClasses[j][1], proposedClasses[j][2]
+        network.add_edge(hub, n + j, max_capacity, 0)
+        network.add_edge(n + j, sink, max_capacity - min_capacity, 0)
+        # the lower bound min_j has to leave class j
+        network.add_edge(n + j, super_sink, min_capacity, 0)
+    # the lower bounds arrive at the sink, and the sink sends everything back to the source (the super sink)
+    network.add_edge(super_source, sink, total_min_capacity, 0)
+    network.add_edge(sink, super_sink, n, 0)
+
+    flow, unsatisfied = min_cost_flow(network, super_source, super_sink)
+    if flow < n + total_min_capacity:
         return None
-    
-    #Phase 2 fix any classes with minimum capacity not met
 
+    # Read the allocation, hub flow into each class is handed to the students who went through the hub
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
+    allocation = [-1] * n
+    hub_students = []
+    for i in range(n):
+        e = head[i]
+        while e >= 0:
+            if not e & 1 and cap[e] == 0:
+                if to[e] == hub:
+                    hub_students.append(i)
+                else:
+                    allocation[i] = to[e] - n
+                break
+            e = nxt[e]
+    e = head[hub]
+    while e >= 0:
+        if not e & 1:
+            class_index = to[e] - n
+            for _ in range(proposedClasses[class_index][2] - cap[e]):
+                allocation[hub_students.pop()] = class_index
+        e = nxt[e]
 
-    # Track students assigned to non-preferred classes
-    nonPreferredAllocatedStudents = [0] * n
-    
-    # Handle minimum capacity constraints
+    return n - unsatisfied, allocation
+
+
+def max_satisfaction(n, m, timePreferences, proposedClasses, engine="dinic", warm_start=True, stats=None):
+    """
+        Function description:
+        Query mode of crowdedCampus, instead of checking a minimumSatisfaction it returns the most students that
+        can be satisfied along with an allocation that does it, so a planner doesn't have to binary search the 
+        threshold with repeated solves.
+
+        The phase 1 max flow is an upper bound on satisfaction, so first phase 1 and the phase 2 repair run as 
+        usual (fast), and if the repair met every min capacity without costing any satisfaction that allocation
+        is optimal. Otherwise the exact answer comes from the min cost flow in allocate_max_satisfaction.
+
+        :Input:
+        argv1-4: n, m, timePreferences, proposedClasses - same as crowdedCampus
+        argv5: engine, warm_start - phase 1 options, same as crowdedCampus
+        argv6: stats - optional SolveStats, gets the phases that ran
+        :Output, return or postcondition: (satisfied_count, allocation) with the max satisfied count possible, 
+        or None if no allocation meets every min and max capacity
+        :Time complexity: phase 1 and 2 of crowdedCampus, plus allocate_max_satisfaction when the repair loses 
+        satisfaction
+        :Space complexity: O(n + m)
+    """
+    if engine not in MAX_FLOW_ENGINES:
+        raise ValueError("unknown max flow engine: %r" % (engine,))
+    total_min_capacity = sum(proposedClasses[j][1] for j in range(m))
+    total_max_capacity = sum(proposedClasses[j][2] for j in range(m))
+    if not total_min_capacity <= n <= total_max_capacity:
+        return None
+
+    assignments = match_preferred_classes(n, m, timePreferences, proposedClasses, engine, warm_start, stats)
+    matched = n - assignments.count(-1)
+    started = time.perf_counter()
+    satisfied_count = repair_min_capacity(n, m, timePreferences, proposedClasses, assignments, matched, stats)
+    if stats is not None:
+        stats.add_phase("phase2", time.perf_counter() - started)
+
+    # the repair is a heuristic, only trust it when it reached the upper bound with every capacity met
+    if satisfied_count == matched and -1 not in assignments:
+        class_counts = [0] * m
+        for class_index in assignments:
+            class_counts[class_index] += 1
+        if all(proposedClasses[j][1] <= class_counts[j] <= proposedClasses[j][2] for j in range(m)):
+            return satisfied_count, assignments
+
+    started = time.perf_counter()
+    result = allocate_max_satisfaction(n, m, timePreferences, proposedClasses)
+    if stats is not None:
+        stats.add_phase("circulation", time.perf_counter() - started)
+    return result
+
+
+def solve_within_budget(n, m, timePreferences, proposedClasses, minimumSatisfaction, time_budget, engine="dinic",
+                        stats=None):
+    """
+        Function description:
+        Anytime crowdedCampus for latency sensitive callers. Phase 1 starts from the greedy seed, and the max 
+        flow engine stops looking for augmenting paths once time_budget seconds have passed since the call 
+        started. Whatever flow it has by then is still a valid matching, so phase 2 repairs it into a full
+        allocation as usual. The network is always built and seeded in full, the budget only cuts the 
+        augmenting, so that much time is spent on large instances no matter the budget.
+
+        proven_optimal says the answer can't be improved on: an allocation is proven when the max flow 
+        finished and the repair lost no satisfaction (it reaches the max flow upper bound), None is proven 
+        when the finished max flow is already below minimumSatisfaction or the capacities can't be met at all.
+        When the deadline passes just as the engine finishes it's reported as not proven, never the other way.
+
+        :Input:
+        argv1-5: n, m, timePreferences, proposedClasses, minimumSatisfaction - same as crowdedCampus
+        argv6: time_budget - seconds the max flow may run until, counted from the start of the call
+        argv7: engine - max flow engine, same as crowdedCampus
+        argv8: stats - optional SolveStats
+        :Output, return or postcondition: (allocation or None, proven_optimal)
+        :Time complexity: building and seeding the network, O(n + m + E), then at most the budget for max flow
+        and phase 2
+        :Space complexity: O(n + m + E), same as crowdedCampus
+    """
+    deadline = time.perf_counter() + time_budget
+    if engine not in MAX_FLOW_ENGINES:
+        raise ValueError("unknown max flow engine: %r" % (engine,))
+    total_min_capacity = sum(proposedClasses[j][1] for j in range(m))
+    total_max_capacity = sum(proposedClasses[j][2] for j in range(m))
+    if not total_min_capacity <= n <= total_max_capacity:
+        return None, True
+
+    started = time.perf_counter()
+    network, source, sink = build_campus_network(n, m, timePreferences, proposedClasses)
+    built = time.perf_counter()
+    greedy_seed(network, source, sink, stats)
+    MAX_FLOW_ENGINES[engine](network, source, sink, stats, deadline)
+    finished = time.perf_counter() < deadline
+    assignments = extract_assignments(network, n)
+    if stats is not None:
+        stats.add_phase("build", built - started)
+        stats.add_phase("phase1", time.perf_counter() - built)
+
+    matched = n - assignments.count(-1)
+    if matched < minimumSatisfaction:
+        return None, finished
+
+    started = time.perf_counter()
+    satisfied_count = repair_min_capacity(n, m, timePreferences, proposedClasses, assignments, matched, stats)
+    if stats is not None:
+        stats.add_phase("phase2", time.perf_counter() - started)
+    if satisfied_count < minimumSatisfaction:
+        return None, False
+    return assignments, finished and satisfied_count == matched
+
+
+def satisfaction_upper_bound(n, m, timePreferences, proposedClasses, exact_slots=12):
+    """
+        Function description:
+        Cheap upper bound on how many students can be satisfied, so crowdedCampus can give up on hopeless 
+        instances before building the flow network. Classes in the same slot are interchangeable for
+        satisfaction, so a slot acts like one class with the sum of their max caps. Each student becomes a 
+        bitmask of their top 5 slots that have a class, students with an empty mask can never be satisfied.
+
+        By Hall's theorem (König's), for any group T of slots at most cap(T) of the students whose mask lies 
+        inside T can be satisfied, and everyone else at most once each, so
+            satisfied <= cap(T) + #(students with a slot outside T)    for every T
+        and the min over all T is exactly the phase 1 max flow. With k offered slots there are 2^k groups, 
+        when k <= exact_slots every group is checked with a subset sum over the masks, otherwise only 
+        the single slots and the masks that students actually have are checked, which is still an upper bound.
+
+        :Input:
+        argv1-4: n, m, timePreferences, proposedClasses - same as crowdedCampus
+        argv5: exact_slots - check every slot group when at most this many slots have classes
+        :Output, return or postcondition: an int >= the max number of students that can get a preferred class
+        :Time complexity: O(n + m + k * 2^k) when exact, O(n + m + D * (k + D')) otherwise
+        :Time complexity analysis: one pass over the students' top 5 slots builds the mask counts, the subset 
+        sum is k passes over 2^k counts. Otherwise D distinct masks are checked against the k single slots and 
+        the D' = 64 most common masks
+        :Space complexity: O(D + 2^k) when exact, O(D) otherwise
+        :Space complexity analysis: one count per distinct mask, plus the subset sum table
+    """
+    # slots with room in them get a bit each
+    slot_capacity = [0] * TIME_SLOTS
     for j in range(m):
-        if class_counts[j] < proposedClasses[j][1]:
-            deficit = proposedClasses[j][1] - class_counts[j]
-            
-            # First use unassigned students
-            for i in range(n):
-                if phase1_assignments[i] == -1 and deficit > 0:
-                    phase1_assignments[i] = j
-                    nonPreferredAllocatedStudents[i] = 1
-                    class_counts[j] += 1
-                    deficit -= 1
-            
-            # If still deficit, sacrifice satisfied students
-            if deficit > 0:
-                for i in range(n):
-                    if (nonPreferredAllocatedStudents[i] != 1 and 
-                        deficit > 0 and 
-                        phase1_assignments[i] != -1 and
-                        (class_counts[phase1_assignments[i]] - 1) >= proposedClasses[phase1_assignments[i]][1]):
-                        
-                        original_class = phase1_assignments[i]
-                        phase1_assignments[i] = j
-                        class_counts[j] += 1
-                        class_counts[original_class] -= 1
-                        deficit -= 1
-                        satisfied_count -= 1
-    
-    # Assign any remaining unassigned students to classes with available capacity
+        slot_capacity[proposedClasses[j][0]] += proposedClasses[j][2]
+    offered = [slot for slot in range(TIME_SLOTS) if slot_capacity[slot] > 0]
+    bit = [0] * TIME_SLOTS
+    for index, slot in enumerate(offered):
+        bit[slot] = 1 << index
+    k = len(offered)
+
+    mask_counts = {}
     for i in range(n):
-        if phase1_assignments[i] == -1:
-            for j in range(m):
-                if class_counts[j] < proposedClasses[j][2]:
-                    phase1_assignments[i] = j
-                    class_counts[j] += 1
+        mask = 0
+        for slot in timePreferences[i][:5]:
+            mask |= bit[slot]
+        mask_counts[mask] = mask_counts.get(mask, 0) + 1
+    matchable = n - mask_counts.pop(0, 0)
+    if matchable == 0:
+        return 0
+
+    if k <= exact_slots:
+        # inside[T] = students whose mask is a subset of T, capacity[T] = cap(T)
+        size = 1 << k
+        inside = [0] * size
+        for mask, count in mask_counts.items():
+            inside[mask] = count
+        for index in range(k):
+            b = 1 << index
+            for T in range(size):
+                if T & b:
+                    inside[T] += inside[T ^ b]
+        capacity = [0] * size
+        best = matchable
+        for T in range(1, size):
+            low = T & -T
+            capacity[T] = capacity[T ^ low] + slot_capacity[offered[low.bit_length() - 1]]
+            bound = capacity[T] + matchable - inside[T]
+            if bound < best:
+                best = bound
+        return best
+
+    # too many groups to try, the single slots and the most common masks are the likely bottlenecks
+    groups = [1 << index for index in range(k)]
+    groups += sorted(mask_counts, key=mask_counts.__getitem__, reverse=True)[:64]
+    best = matchable
+    for T in groups:
+        capacity = sum(slot_capacity[offered[index]] for index in range(k) if T >> index & 1)
+        inside = sum(count for mask, count in mask_counts.items() if mask & T == mask)
+        bound = capacity + matchable - inside
+        if bound < best:
+            best = bound
+    return best
+
+
+def _solve_chunk(start, instances, options):
+    """
+    Function description:
+    Worker side of solve_campus_batch, solves a chunk of instances one after the other and times each one.
+    Module level so the process pool can pickle it.
+
+    :Output, return or postcondition: list of (index, allocation, seconds), index counts from start
+    """
+    results = []
+    for offset, instance in enumerate(instances):
+        started = time.perf_counter()
+        allocation = crowdedCampus(*instance, **options)
+        results.append((start + offset, allocation, time.perf_counter() - started))
+    return results
+
+
+def solve_campus_batch(instances, workers=None, chunksize=1, ordered=True, **options):
+    """
+        Function description:
+        Solves many independent crowdedCampus instances across a process pool. Instances are cut into chunks of 
+        chunksize so each trip to a worker carries enough work to be worth the pickling, and at most 2 chunks per 
+        worker are in flight so a long (or lazy) iterable of instances is never all held in memory at once. 
+        Results are yielded as they arrive, in input order when ordered is True, otherwise as soon as each chunk 
+        finishes.
+
+        :Input:
+        argv1: instances - iterable of (n, m, timePreferences, proposedClasses, minimumSatisfaction) tuples
+        argv2: workers - number of worker processes, None uses every core, 0 solves in this process with no pool
+        argv3: chunksize - instances sent to a worker at a time
+        argv4: ordered - yield in input order (True) or in completion order (False)
+        argv5: options - keyword arguments passed to every crowdedCampus call (engine, aggregate, phase2, warm_start)
+        :Output, return or postcondition: generator of (index, allocation, seconds), index is the instance's position
+        in instances, allocation is what crowdedCampus returned and seconds is its wall time in the worker
+        :Time complexity: sum of the crowdedCampus calls, divided across the workers
+        :Space complexity: O(workers * chunksize) instances in flight, plus whatever the caller keeps
+    """
+    # checked here rather than in the generator so bad arguments fail on the call, not on the first result
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    if "stats" in options:
+        raise ValueError("stats can't be shared across worker processes")
+    if workers is not None and workers < 0:
+        raise ValueError("workers can't be negative")
+    return _solve_batch(iter(instances), workers, chunksize, ordered, options)
+
+
+def _solve_batch(instances, workers, chunksize, ordered, options):
+    """
+    Function description:
+    Generator behind solve_campus_batch, which has already checked the arguments.
+    """
+    if workers == 0:
+        start = 0
+        while True:
+            chunk = list(islice(instances, chunksize))
+            if not chunk:
+                return
+            yield from _solve_chunk(start, chunk, options)
+            start += len(chunk)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()           # futures in submission order
+        next_start = 0              # index of the first instance in the next chunk
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                chunk = list(islice(instances, chunksize))
+                if not chunk:
+                    exhausted = True
                     break
-    
-    # Final check
-    if satisfied_count < minimumSatisfaction:
-        return None
-        
-    return phase1_assignments
+                pending.append(pool.submit(_solve_chunk, next_start, chunk, options))
+                next_start += len(chunk)
+            if not pending:
+                return
+
+            if ordered:
+                # the oldest chunk is the next one to yield, so just wait on it
+                yield from pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield from future.result()
+
+
+class CampusAllocator:
+    """
+    Stateful crowdedCampus. It keeps the phase 1 flow network between calls so when one student changes their 
+    preferences, a class's capacities change, or students join or leave, only the flow touching that change is 
+    cancelled and a few augmenting paths repair the max flow, instead of rebuilding the network and solving again.
+    Every update returns an allocation for the current inputs that passes the same capacity and satisfaction
+    checks as crowdedCampus, or None. The kept flow is always a max flow, but it can be a different max flow 
+    from the one a fresh solve finds, and the phase 2 repair depends on which one it starts from, so the 
+    allocation (and occasionally whether it's None) can differ from crowdedCampus on the same inputs.
+
+    Node layout is source 0, sink 1, classes 2 to m+1, then students in the order they were added. A student's 
+    edges are disabled (capacity 0 both ways) rather than removed when they change, so a long lived allocator 
+    grows by the edges of every update.
+    """
+    def __init__(self, n, m, timePreferences, proposedClasses, minimumSatisfaction=0, engine="dinic", warm_start=True):
+        """
+        Function description:
+        Builds the network and runs the first full max flow.
+        :Input: same as crowdedCampus
+        :Output, return or postcondition: None
+        :Time complexity: same as match_preferred_classes
+        :Space complexity: O(n + m)
+        """
+        if engine not in MAX_FLOW_ENGINES:
+            raise ValueError("unknown max flow engine: %r" % (engine,))
+        self.m = m
+        self.minimumSatisfaction = minimumSatisfaction
+        self.proposedClasses = [list(proposedClasses[j]) for j in range(m)]
+        self.classes_at_slot = index_classes_by_slot(m, self.proposedClasses)
+        self.network = FlowNetwork(m + 2)
+        self.source = 0
+        self.sink = 1
+        self.class_sink_edges = [self.network.add_edge(j + 2, self.sink, self.proposedClasses[j][2]) for j in range(m)]
+        self.top_five = []
+        self.student_nodes = []
+        self.source_edges = []
+        for i in range(n):
+            self._add_student_node(timePreferences[i][:5])
+        if warm_start:
+            greedy_seed(self.network, self.source, self.sink)
+        MAX_FLOW_ENGINES[engine](self.network, self.source, self.sink)
+
+    def _add_student_node(self, slots):
+        # new student node, connected from the source and to every class in their 5 slots
+        network = self.network
+        node = network.add_node()
+        self.top_five.append(list(slots[:5]))
+        self.student_nodes.append(node)
+        self.source_edges.append(network.add_edge(self.source, node, 1))
+        self._connect_student(node, slots)
+
+    def _connect_student(self, node, slots):
+        for slot in slots[:5]:
+            for j in self.classes_at_slot[slot]:
+                self.network.add_edge(node, j + 2, 1)
+
+    def _matched_edge(self, node):
+        # the student -> class edge carrying the student's unit of flow, -1 if they're unmatched
+        head, nxt, cap = self.network.head, self.network.next, self.network.cap
+        e = head[node]
+        while e >= 0:
+            # a forward edge carries flow when its reverse edge has capacity, disabled edges have none either way
+            if not e & 1 and cap[e ^ 1] > 0:
+                return e
+            e = nxt[e]
+        return -1
+
+    def _cancel_student(self, i):
+        # take student i's unit of flow off source -> student -> class -> sink
+        network = self.network
+        cap = network.cap
+        e = self._matched_edge(self.student_nodes[i])
+        if e < 0:
+            return
+        class_index = network.to[e] - 2
+        for edge in (self.source_edges[i], e, self.class_sink_edges[class_index]):
+            cap[edge] += 1
+            cap[edge ^ 1] -= 1
+
+    def _disable_student_edges(self, node, keep_source=True):
+        head, nxt, cap = self.network.head, self.network.next, self.network.cap
+        e = head[node]
+        while e >= 0:
+            if not e & 1 or not keep_source:
+                cap[e] = 0
+                cap[e ^ 1] = 0
+            e = nxt[e]
+
+    def _augment(self):
+        # the flow is a valid flow that may no longer be max, ford_fulkerson_dfs only has to find the 
+        # few augmenting paths the change opened up
+        ford_fulkerson_dfs(self.network, self.source, self.sink)
+
+    def update_preferences(self, i, slots):
+        """
+        Function description:
+        Student i now prefers the time slots given (only the first 5 are used).
+        :Output, return or postcondition: the new allocation, or None
+        :Time complexity: O(E) for the repair, at most 2 augmenting paths, plus allocation()
+        :Space complexity: O(1) new edges beyond the student's new class edges
+        """
+        self._cancel_student(i)
+        node = self.student_nodes[i]
+        self._disable_student_edges(node)
+        self.top_five[i] = list(slots[:5])
+        self._connect_student(node, slots)
+        self._augment()
+        return self.allocation()
+
+    def set_capacity(self, j, min_capacity, max_capacity):
+        """
+        Function description:
+        Changes class j's min and max capacity. If the class now has more students than the new max, just enough
+        of them are taken out of it before repairing the flow (they may get another preferred class).
+        :Output, return or postcondition: the new allocation, or None
+        :Time complexity: O(k*E) plus allocation(), where k is how much the max capacity changed
+        :Space complexity: O(1)
+        """
+        network = self.network
+        cap, to, nxt = network.cap, network.to, network.next
+        self.proposedClasses[j][1] = min_capacity
+        self.proposedClasses[j][2] = max_capacity
+        sink_edge = self.class_sink_edges[j]
+        flow = cap[sink_edge ^ 1]
+        if flow > max_capacity:
+            # the reverse edge of a used student -> class edge has capacity, its head is that student
+            node_to_student = {node: i for i, node in enumerate(self.student_nodes)}
+            e = network.head[j + 2]
+            while e >= 0 and flow > max_capacity:
+                if e & 1 and cap[e] > 0 and to[e] in node_to_student:
+                    self._cancel_student(node_to_student[to[e]])
+                    flow -= 1
+                e = nxt[e]
+        cap[sink_edge] = max_capacity - flow
+        self._augment()
+        return self.allocation()
+
+    def add_student(self, slots):
+        """
+        Function description:
+        Adds a new student with the time slots given, their index is the current number of students.
+        :Output, return or postcondition: the new allocation, or None
+        :Time complexity: O(E) for at most 1 augmenting path, plus allocation()
+        :Space complexity: O(1) new nodes and edges (at most the classes in 5 slots)
+        """
+        self._add_student_node(slots)
+        self._augment()
+        return self.allocation()
+
+    def drop_student(self, i):
+        """
+        Function description:
+        Removes student i, the students after them move down one index like list.pop.
+        :Output, return or postcondition: the new allocation, or None
+        :Time complexity: O(n) to shift the student lists, plus O(E) for at most 1 augmenting path and allocation()
+        :Space complexity: O(1)
+        """
+        self._cancel_student(i)
+        self._disable_student_edges(self.student_nodes[i], keep_source=False)
+        self.student_nodes.pop(i)
+        self.source_edges.pop(i)
+        self.top_five.pop(i)
+        self._augment()
+        return self.allocation()
+
+    def preferred_assignments(self):
+        """
+        Function description:
+        Phase 1 result for the current inputs, the class each student got through the max flow, -1 if none.
+        :Time complexity: O(n + E)
+        :Space complexity: O(n)
+        """
+        to = self.network.to
+        assignments = [-1] * len(self.student_nodes)
+        for i, node in enumerate(self.student_nodes):
+            e = self._matched_edge(node)
+            if e >= 0:
+                assignments[i] = to[e] - 2
+        return assignments
+
+    def allocation(self):
+        """
+        Function description:
+        The allocation for the current inputs: the kept max flow as phase 1, then the phase 2 repair, with the 
+        same capacity and satisfaction checks as crowdedCampus.
+        :Output, return or postcondition: list of allocation for students based on index, or None
+        :Time complexity: O(n + m + S log m), from repair_min_capacity, S is the number of students sacrificed
+        :Space complexity: O(n + m)
+        """
+        n, m = len(self.student_nodes), self.m
+        proposedClasses = self.proposedClasses
+        if n < sum(proposedClasses[j][1] for j in range(m)) or n > sum(proposedClasses[j][2] for j in range(m)):
+            return None
+        assignments = self.preferred_assignments()
+        satisfied_count = n - assignments.count(-1)
+        if satisfied_count < self.minimumSatisfaction:
+            return None
+        satisfied_count = repair_min_capacity(n, m, self.top_five, proposedClasses, assignments, satisfied_count)
+        if satisfied_count < self.minimumSatisfaction:
+            return None
+        return assignments
+
+
+class SolveStats:
+    """
+    Optional instrumentation for crowdedCampus and the max flow engines. Pass one in as stats and it is filled
+    as the solve runs, the solve's return value doesn't change. phase_seconds holds the wall time of each phase 
+    ("precheck", "cache", "decompose", "build", "phase1", "phase2", or "circulation"), the other attributes are counters added up over every call 
+    it was passed to. Reverse edges are found with e ^ 1 so they are never scanned for, edge_updates counts the
+    O(1) capacity updates instead. callback, if given, is called with (phase, seconds) as each phase finishes.
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.phase_seconds = {}
+        self.searches = 0               # graph searches, a dfs/bfs per augmenting path or a dinic phase
+        self.nodes_visited = 0          # nodes reached over all searches
+        self.augmenting_paths = 0
+        self.edge_updates = 0           # forward and reverse capacity updates
+        self.greedy_flow = 0            # flow placed by greedy_seed before the engine ran
+        self.unassigned_placed = 0      # phase 2, unmatched students put into classes below min capacity
+        self.sacrifices = 0             # phase 2, matched students moved to classes below min capacity
+        self.satisfaction_lost = 0      # phase 2, sacrifices that ended up outside their top 5 slots
+        self.leftovers_placed = 0       # phase 2, unmatched students put into any class with room
+
+    def add_phase(self, phase, seconds):
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+        if self.callback is not None:
+            self.callback(phase, seconds)
+
+    def add_flow_counts(self, searches, nodes_visited, augmenting_paths, edge_updates):
+        self.searches += searches
+        self.nodes_visited += nodes_visited
+        self.augmenting_paths += augmenting_paths
+        self.edge_updates += edge_updates
+
+    def add_repair_counts(self, unassigned_placed, sacrifices, satisfaction_lost, leftovers_placed):
+        self.unassigned_placed += unassigned_placed
+        self.sacrifices += sacrifices
+        self.satisfaction_lost += satisfaction_lost
+        self.leftovers_placed += leftovers_placed
+
+    def nodes_per_search(self):
+        return self.nodes_visited / self.searches if self.searches else 0.0
+
+    def as_dict(self):
+        """
+        Function description:
+        Everything recorded as a plain dict (JSON friendly), phase times under "phase_seconds".
+        """
+        return {
+            "phase_seconds": dict(self.phase_seconds),
+            "searches": self.searches,
+            "nodes_visited": self.nodes_visited,
+            "nodes_per_search": self.nodes_per_search(),
+            "augmenting_paths": self.augmenting_paths,
+            "edge_updates": self.edge_updates,
+            "greedy_flow": self.greedy_flow,
+            "unassigned_placed": self.unassigned_placed,
+            "sacrifices": self.sacrifices,
+            "satisfaction_lost": self.satisfaction_lost,
+            "leftovers_placed": self.leftovers_placed,
+        }
+
+
+class Phase1Cache:
+    """
+    LRU cache of phase 1 results for crowdedCampus(..., cache=...). The max flow only depends on the students'
+    top 5 slots, each class's slot and max capacity and the phase 1 options, not on minimumSatisfaction or
+    the min capacities, so those are all that go into the key (a sha256 of their contents). What-if 
+    scenarios that only move the satisfaction threshold or the min capacities go straight to phase 2.
+
+    At most maxsize results are kept in memory, least recently used go first. With directory every result 
+    is also written there as <key>.phase1 (the assignments as raw ints) and read back on a memory miss, so 
+    the cache survives restarts, files there are never evicted. hits and misses count the lookups.
+    """
+    def __init__(self, maxsize=128, directory=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(n, m, timePreferences, proposedClasses, **options):
+        """
+        Function description:
+        Content hash of everything phase 1 depends on.
+
+        :Input:
+        argv1-4: n, m, timePreferences, proposedClasses - same as crowdedCampus
+        argv5: options - the phase 1 options (engine, warm_start, ...), part of the key since they can change
+        which students get matched
+        :Output, return or postcondition: hex digest string
+        :Time complexity: O(n + m)
+        :Space complexity: O(n + m)
+        :Space complexity analysis: the top 5 slots are hashed as one bytes object, 5 bytes per student
+        """
+        digest = hashlib.sha256()
+        digest.update(repr((n, m, sorted(options.items()))).encode())
+        buffer = getattr(timePreferences, "buffer", None)    # campus_loader.TopFivePreferences
+        if buffer is not None:
+            digest.update(buffer[:5 * n])
+        else:
+            digest.update(bytes(slot for i in range(n) for slot in timePreferences[i][:5]))
+        classes = array('q')
+        for j in range(m):
+            classes.append(proposedClasses[j][0])
+            classes.append(proposedClasses[j][2])
+        digest.update(classes.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".phase1")
+
+    def get(self, key):
+        """
+        Function description:
+        The cached assignments for key as a new list (crowdedCampus repairs them in place), or None.
+        :Time complexity: O(n) on a hit, O(1) on a miss
+        """
+        assignments = self.entries.get(key)
+        if assignments is not None:
+            self.entries.move_to_end(key)
+        elif self.directory is not None and os.path.exists(self._path(key)):
+            assignments = array('i')
+            with open(self._path(key), "rb") as f:
+                assignments.frombytes(f.read())
+            self._remember(key, assignments)
+        if assignments is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return assignments.tolist()
+
+    def put(self, key, assignments):
+        """
+        Function description:
+        Stores a copy of the phase 1 assignments under key, and on disk if there is a directory.
+        :Time complexity: O(n)
+        """
+        stored = array('i', assignments)
+        self._remember(key, stored)
+        if self.directory is not None:
+            # written to a temporary file then renamed, so readers never see half a file
+            path = self._path(key)
+            with open(path + ".tmp", "wb") as f:
+                f.write(stored.tobytes())
+            os.replace(path + ".tmp", path)
+
+    def _remember(self, key, stored):
+        self.entries[key] = stored
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Function description:
+        Empties the memory cache, the files on disk are kept.
+        """
+        self.entries.clear()
+
+
+class FlowNetwork:
+    """
+    Compact flow network stored in flat arrays instead of lists of [neighbor, capacity] lists.
+    Edges are kept in forward-star form (head/next/to/cap arrays of C ints): head[u] is the last edge
+    added out of u and next[e] is the edge added out of the same node before e, -1 ends the list.
+    Every edge is added together with its reverse edge, so edge e's reverse is always e ^ 1 (forward
+    edges are even, reverse edges odd) and updating flow never needs a lookup.
+
+    The network is the residual graph itself, the max flow engines change cap in place, so it is built
+    once and shared by the solver and the assignment extraction without any copies.
+    """
+    def __init__(self, total_nodes):
+        """
+        Function description:
+        Creates a network with total_nodes nodes and no edges.
+        :Input:
+        argv1: total_nodes: int, the number of nodes
+        :Output, return or postcondition: None
+        :Time complexity: O(V)
+        :Time complexity analysis: head is filled with -1 for every node
+        :Space complexity: O(V)
+        :Space complexity analysis: one int per node in head
+        """
+        self.total_nodes = total_nodes
+        self.head = array('i', [-1]) * total_nodes
+        self.next = array('i')
+        self.to = array('i')
+        self.cap = array('i')
+
+    def add_node(self):
+        """
+        Function description:
+        Adds a node with no edges and returns its index.
+        :Time complexity: O(1) amortised
+        :Space complexity: O(1)
+        """
+        self.head.append(-1)
+        self.total_nodes += 1
+        return self.total_nodes - 1
+
+    def add_edge(self, u, v, capacity):
+        """
+        Function description:
+        Adds edge (u,v) with the capacity given, and its reverse edge (v,u) with capacity 0.
+        :Input:
+        argv1: u: int, tail node
+        argv2: v: int, head node
+        argv3: capacity: int, capacity of the edge
+        :Output, return or postcondition: index e of the forward edge, the reverse edge is e ^ 1
+        :Time complexity: O(1) amortised
+        :Time complexity analysis: appends to the end of each array
+        :Space complexity: O(1)
+        :Space complexity analysis: 2 entries in next, to and cap
+        """
+        e = len(self.to)
+        self.to.append(v)
+        self.cap.append(capacity)
+        self.next.append(self.head[u])
+        self.head[u] = e
+        self.to.append(u)
+        self.cap.append(0)
+        self.next.append(self.head[v])
+        self.head[v] = e + 1
+        return e
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Function description:
+        Builds a network from an adjacency list graph (each node has a list of [neighbor, capacity]). 
+        The k-th edge in graph order (nodes ascending, then list order) becomes forward edge 2k.
+        :Time complexity: O(V + E)
+        :Space complexity: O(V + E)
+        """
+        network = cls(len(graph))
+        for u in range(len(graph)):
+            for v, capacity in graph[u]:
+                network.add_edge(u, v, capacity)
+        return network
+
+    def to_residual_graph(self, graph):
+        """
+        Function description:
+        Lists of [neighbor, residual capacity] for every node, laid out like the residual graph
+        space_efficient_ford_fulkerson has always returned: for each edge (u,v) of graph in order,
+        the forward edge is appended to u's list and the reverse edge to v's list.
+        :Input:
+        argv1: graph: the adjacency list graph this network was built from with from_graph
+        :Output, return or postcondition: residual_graph as lists of lists
+        :Time complexity: O(V + E)
+        :Space complexity: O(V + E)
+        """
+        cap = self.cap
+        residual_graph = [[] for _ in range(self.total_nodes)]
+        e = 0
+        for u in range(len(graph)):
+            for v, _ in graph[u]:
+                residual_graph[u].append([v, cap[e]])
+                residual_graph[v].append([u, cap[e + 1]])
+                e += 2
+        return residual_graph
 
 
-def space_efficient_ford_fulkerson(graph, source, sink):
+class CostFlowNetwork(FlowNetwork):
+    """
+    FlowNetwork where every edge also has a cost per unit of flow, the reverse edge e ^ 1 has the negated cost.
+    Kept separate so the plain max flow networks don't pay for a cost array.
+    """
+    def __init__(self, total_nodes):
+        FlowNetwork.__init__(self, total_nodes)
+        self.cost = array('i')
+
+    def add_edge(self, u, v, capacity, cost=0):
+        """
+        Function description:
+        Adds edge (u,v) with the capacity and cost given, and its reverse edge (v,u) with capacity 0 and cost -cost.
+        :Output, return or postcondition: index e of the forward edge, the reverse edge is e ^ 1
+        :Time complexity: O(1) amortised
+        :Space complexity: O(1)
+        """
+        e = FlowNetwork.add_edge(self, u, v, capacity)
+        self.cost.append(cost)
+        self.cost.append(-cost)
+        return e
+
+
+def ford_fulkerson_dfs(network, source, sink, stats=None, deadline=None):
     """
         Function description:
         We use ford-fulkerson with dfs to find the maximum matching in this bipartite graph, through 
-        finding max flow. Its residual graph is space-efficient, it stores lists of lists to hold the
-        outgoing edges for a node (v, capacity), not through indexes which would be a flow matrix requiring
-        O(n^2) space.
+        finding max flow. The flow network is space-efficient, edges are stored in flat arrays 
+        (see FlowNetwork), not through indexes which would be a flow matrix requiring O(n^2) space.
 
         :Input:
-        argv1:graph - adjacency list representation of the graph, where each node has a list of [neighbor, capacity]
+        argv1: network - FlowNetwork, its capacities are changed in place into the residual graph
         argv2: source - the source node index
         argv3: sink - the sink node index
+        argv4: stats - optional SolveStats, gets the number of searches, nodes visited, augmenting paths and edge updates
+        argv5: deadline - optional time.perf_counter() value, no new augmenting path is searched for after it
 
-        :Output, return or postcondition: residual_graph
+        :Output, return or postcondition: the max flow value, network holds the residual graph. If the deadline
+        passed it's the flow found so far, still a valid flow
         :Time complexity: O(n^2) worst case
-        :Time complexity analysis: with dfs the worst time complex is O(E*max_flow). The max possible flow is n, number of students since we 
+        :Time complexity analysis: the dfs uses an explicit stack, so it has the same complexity as the recursive version. With dfs the worst time complex is O(E*max_flow). The max possible flow is n, number of students since we 
         only have n amount of students to assign once. The number of edges is : n (source to students) + 5n (if each student was connected to their 5 preferred classes) + n (classes to sink, the most classes we can have is equal to students since min capacity possible is 1 and sum of min caps =< n) = 7n = n
         therefore O(n^2) in the worst case.
+        Updating an edge and its reverse (e ^ 1) is O(1), so the path update is O(path length).
         :Space complexity: O(n)
-        :Space complexity analysis: The residual graph takes up the most space, in the worst case we hold edges from students to their 5 preferred classes thus: 5n, edges from source to students n, an
+        :Space complexity analysis: the network takes up the most space, in the worst case we hold edges from students to their 5 preferred classes thus: 5n, edges from source to students n, and
+        classes to sink n, each with a reverse edge, so O(n). The search arrays are O(V).
     """
-    total_nodes = len(graph)
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
+    total_nodes = network.total_nodes
 
-    # Create residual graph - for each edge (u,v) we also add reverse edge (v,u)
-    residual_graph = [[] for _ in range(total_nodes)]
-    # For each edge in original graph, add forward and reverse edges
-    for u in range(total_nodes):
-        for v, capacity in graph[u]:
-            residual_graph[u].append([v, capacity])
-            residual_graph[v].append([u, 0])
-    
-    # DFS to find augmenting path
-    def dfs(u, visited, min_capacity_so_far):
-        # If we reached the sink, we found a path
-        if u == sink:
-            return True, min_capacity_so_far, []
-        
-        visited[u] = True
-        
-        # Try all outgoing edges
-        for idx, [v, capacity] in enumerate(residual_graph[u]):
-            if not visited[v] and capacity > 0:
-                # Calculate new minimum capacity along this path
-                new_min_capacity = min(min_capacity_so_far, capacity)
-                
-                # Continue DFS from v
-                found, path_capacity, path = dfs(v, visited, new_min_capacity)
-                
-                if found:
-                    # Add this edge to the path
-                    path.append([u, v, idx])
-                    return True, path_capacity, path
-        
-        return False, 0, []
+    # parent_edge[v] is the edge we reached v through, its tail is to[parent_edge[v] ^ 1], so a path
+    # is rebuilt by walking back from the sink instead of returning path lists
+    parent_edge = [-1] * total_nodes
+    searches = nodes_visited = 0
+
+    # Iterative DFS to find augmenting path, the explicit stack replaces the recursion so long paths
+    # can't hit the recursion limit. next_edge[u] is the next edge of u the search will try
+    def dfs():
+        nonlocal searches, nodes_visited
+        searches += 1
+        nodes_visited += 1
+        visited = [False] * total_nodes
+        next_edge = list(head)
+        visited[source] = True
+        stack = [source]
+        while stack:
+            u = stack[-1]
+            # If we reached the sink, we found a path
+            if u == sink:
+                return True
+            e = next_edge[u]
+            while e >= 0 and (visited[to[e]] or cap[e] <= 0):
+                e = nxt[e]
+            if e < 0:
+                # dead end, backtrack
+                stack.pop()
+                continue
+            next_edge[u] = nxt[e]
+            v = to[e]
+            visited[v] = True
+            parent_edge[v] = e
+            stack.append(v)
+            nodes_visited += 1
+        return False
     
     # Find augmenting paths and update flow
-    while True:
-        visited = [False] * (total_nodes)
-        found, path_capacity, path = dfs(source, visited, float('inf'))
+    max_flow = 0
+    augmenting_paths = edge_updates = 0
+    while (deadline is None or time.perf_counter() < deadline) and dfs():
+        # Bottleneck capacity along the path, walking back from the sink
+        path_capacity = float('inf')
+        v = sink
+        while v != source:
+            e = parent_edge[v]
+            path_capacity = min(path_capacity, cap[e])
+            v = to[e ^ 1]
         
-        if not found:
+        # Update forward edge and its reverse edge in place, O(1) each
+        v = sink
+        while v != source:
+            e = parent_edge[v]
+            cap[e] -= path_capacity
+            cap[e ^ 1] += path_capacity
+            v = to[e ^ 1]
+            edge_updates += 2
+        max_flow += path_capacity
+        augmenting_paths += 1
+
+    if stats is not None:
+        stats.add_flow_counts(searches, nodes_visited, augmenting_paths, edge_updates)
+    return max_flow
+
+
+def edmonds_karp(network, source, sink, stats=None, deadline=None):
+    """
+        Function description:
+        Edmonds-Karp, ford-fulkerson where the augmenting path is found with bfs so its always a shortest path.
+        The bfs records parent edges instead of building path lists, and never recurses, so it can handle 
+        hundreds of thousands of students without touching the recursion limit.
+
+        :Input:
+        argv1: network - FlowNetwork, its capacities are changed in place into the residual graph
+        argv2: source - the source node index
+        argv3: sink - the sink node index
+        argv4: stats - optional SolveStats, same counts as ford_fulkerson_dfs
+        argv5: deadline - optional time.perf_counter() value, same as ford_fulkerson_dfs
+
+        :Output, return or postcondition: the max flow value (or the flow so far if the deadline passed), 
+        network holds the residual graph
+        :Time complexity: O(n^2)
+        :Time complexity analysis: each bfs is O(E) = O(n) and every augmenting path carries at least 1 unit, 
+        the max flow is at most n students, so O(E*max_flow) = O(n^2) like the dfs version. After the greedy 
+        seed the remaining augmenting paths are long alternating paths and each bfs searches most of the graph, 
+        so this is the slow reference engine, dinic is much faster on large instances.
+        :Space complexity: O(n)
+        :Space complexity analysis: the queue and parent list are O(V), on top of the network itself.
+    """
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
+    total_nodes = network.total_nodes
+    parent_edge = [-1] * total_nodes
+    searches = nodes_visited = 0
+
+    def bfs():
+        nonlocal searches, nodes_visited
+        searches += 1
+        visited = [False] * total_nodes
+        visited[source] = True
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            nodes_visited += 1
+            e = head[u]
+            while e >= 0:
+                v = to[e]
+                if not visited[v] and cap[e] > 0:
+                    visited[v] = True
+                    parent_edge[v] = e
+                    if v == sink:
+                        return True
+                    queue.append(v)
+                e = nxt[e]
+        return False
+
+    max_flow = 0
+    augmenting_paths = edge_updates = 0
+    while (deadline is None or time.perf_counter() < deadline) and bfs():
+        # Bottleneck capacity walking back from the sink
+        path_capacity = float('inf')
+        v = sink
+        while v != source:
+            e = parent_edge[v]
+            path_capacity = min(path_capacity, cap[e])
+            v = to[e ^ 1]
+
+        v = sink
+        while v != source:
+            e = parent_edge[v]
+            cap[e] -= path_capacity
+            cap[e ^ 1] += path_capacity
+            v = to[e ^ 1]
+            edge_updates += 2
+        max_flow += path_capacity
+        augmenting_paths += 1
+
+    if stats is not None:
+        stats.add_flow_counts(searches, nodes_visited, augmenting_paths, edge_updates)
+    return max_flow
+
+
+def blocking_flow(network, source, sink, level, admissible, deadline=None):
+    """
+        Function description:
+        Pushes a blocking flow through the level graph, shared by dinic and min_cost_flow. An iterative dfs 
+        only follows edges going exactly one level deeper that admissible(u, e) accepts. The stack is the 
+        current path from the source and path_edges the edges between its nodes, each one being its tail's 
+        current arc, so no path lists are returned. A current-arc pointer per node remembers which edge to
+        try next, so an edge that couldn't reach the sink is never retried in the same phase.
+
+        :Input:
+        argv1: network - FlowNetwork, capacities are changed in place
+        argv2: source - the source node index
+        argv3: sink - the sink node index
+        argv4: level - bfs level of every node, -1 if unreachable
+        argv5: admissible - function (u, e) -> bool, whether edge e out of u can carry flow
+        argv6: deadline - optional time.perf_counter() value, checked after every augmenting path
+        :Output, return or postcondition: (flow pushed, nodes visited, augmenting paths, edge updates)
+        :Time complexity: O(V * E), O(E) plus the path lengths for unit capacity networks like crowdedCampus's
+        :Time complexity analysis: every edge is either saturated or skipped once thanks to the current arcs
+        :Space complexity: O(V)
+    """
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
+    pushed = nodes_visited = augmenting_paths = edge_updates = 0
+    current_arc = list(head)
+    stack = [source]
+    path_edges = []
+    while stack:
+        u = stack[-1]
+        if u == sink:
+            augmenting_paths += 1
+            edge_updates += 2 * len(path_edges)
+            # Bottleneck along the path, then push it and cut the path back to the first saturated edge
+            path_capacity = min(cap[e] for e in path_edges)
+            first_saturated = -1
+            for pos, e in enumerate(path_edges):
+                cap[e] -= path_capacity
+                cap[e ^ 1] += path_capacity
+                if cap[e] == 0 and first_saturated < 0:
+                    first_saturated = pos
+            del stack[first_saturated + 1:]
+            del path_edges[first_saturated:]
+            pushed += path_capacity
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            continue
+        e = current_arc[u]
+        while e >= 0 and (level[to[e]] != level[u] + 1 or not admissible(u, e)):
+            e = nxt[e]
+        current_arc[u] = e
+        if e < 0:
+            # u is a dead end for the rest of the phase, retreat and skip the edge into it
+            stack.pop()
+            if path_edges:
+                path_edges.pop()
+                w = stack[-1]
+                current_arc[w] = nxt[current_arc[w]]
+            continue
+        stack.append(to[e])
+        path_edges.append(e)
+        nodes_visited += 1
+    return pushed, nodes_visited, augmenting_paths, edge_updates
+
+
+def dinic(network, source, sink, stats=None, deadline=None):
+    """
+        Function description:
+        Dinic's algorithm on the flow network. Each phase runs a bfs from the source to label every node 
+        with its level (distance), then pushes a blocking flow with an iterative dfs that only follows edges 
+        going exactly one level deeper. A current-arc pointer per node remembers which edge to try next, so an
+        edge that couldn't reach the sink is never retried in the same phase.
+
+        :Input:
+        argv1: network - FlowNetwork, its capacities are changed in place into the residual graph
+        argv2: source - the source node index
+        argv3: sink - the sink node index
+        argv4: stats - optional SolveStats, a search is one phase (level graph bfs plus blocking flow dfs)
+        argv5: deadline - optional time.perf_counter() value, checked after every augmenting path and before 
+        every phase
+
+        :Output, return or postcondition: the max flow value (or the flow so far if the deadline passed), 
+        network holds the residual graph
+        :Time complexity: O(n*sqrt(n))
+        :Time complexity analysis: each phase is O(E) for the bfs plus O(E) for the blocking flow thanks to the 
+        current-arc pointers (every edge is either saturated or skipped once per phase). Every student node 
+        only has 1 unit coming in from the source, so like hopcroft-karp after sqrt(V) phases the remaining 
+        augmenting paths are longer than sqrt(V) and student disjoint, leaving at most sqrt(V) more phases. 
+        E and V are both O(n) (see ford_fulkerson_dfs), so O(n*sqrt(n)).
+        :Space complexity: O(n)
+        :Space complexity analysis: the level and current-arc lists are O(V) = O(n), on top of the network itself.
+    """
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
+    total_nodes = network.total_nodes
+    searches = nodes_visited = augmenting_paths = edge_updates = 0
+
+    # BFS from the source giving each reachable node its level, -1 if it can't be reached
+    def bfs_levels():
+        nonlocal searches, nodes_visited
+        searches += 1
+        level = [-1] * total_nodes
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            nodes_visited += 1
+            e = head[u]
+            while e >= 0:
+                v = to[e]
+                if cap[e] > 0 and level[v] < 0:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+                e = nxt[e]
+        return level
+
+    # in dinic's level graph every edge with capacity left can carry flow, see blocking_flow
+    def has_capacity(u, e):
+        return cap[e] > 0
+
+    max_flow = 0
+    level = bfs_levels()
+    while level[sink] >= 0:
+        pushed, visited, paths, updates = blocking_flow(network, source, sink, level, has_capacity, deadline)
+        max_flow += pushed
+        nodes_visited += visited
+        augmenting_paths += paths
+        edge_updates += updates
+        if deadline is not None and time.perf_counter() >= deadline:
             break
-            
-        # Reverse path to go from source to sink
-        path.reverse()
-        
-        # Update residual capacities
-        for u, v, idx in path:
-            # Update forward edge
-            residual_graph[u][idx] = [residual_graph[u][idx][0], residual_graph[u][idx][1] - path_capacity]
-            
-            # Find and update reverse edge
-            for rev_idx, [rev_v, rev_cap] in enumerate(residual_graph[v]):
-                if rev_v == u:
-                    residual_graph[v][rev_idx] = [u, rev_cap + path_capacity]
-                    break
-        
-    return residual_graph
+        level = bfs_levels()
+
+    if stats is not None:
+        stats.add_flow_counts(searches, nodes_visited, augmenting_paths, edge_updates)
+    return max_flow
+
+
+def min_cost_flow(network, source, sink):
+    """
+        Function description:
+        Min cost max flow with the primal-dual method. Node potentials keep every residual edge's reduced cost
+        (cost + potential[u] - potential[v]) non negative, so dijkstra finds shortest paths. After each dijkstra 
+        the potentials are moved so every shortest path edge has reduced cost 0, then as much flow as possible 
+        is pushed along only those edges with dinic style level graphs and blocking flows, before the next dijkstra.
+        Edge costs must start non negative.
+
+        :Input:
+        argv1: network - CostFlowNetwork, its capacities are changed in place into the residual graph
+        argv2: source - the source node index
+        argv3: sink - the sink node index
+
+        :Output, return or postcondition: (flow, cost) the max flow value and its minimum total cost
+        :Time complexity: O(D * (E log V + F_d * E)) 
+        :Time complexity analysis: D is the number of distinct shortest path costs (each dijkstra round raises it),
+        each round is a dijkstra, O(E log V), plus dinic on the zero reduced cost edges. With crowdedCampus's 0/1 
+        costs D is small, in the worst case it is bounded by the max flow.
+        :Space complexity: O(V)
+        :Space complexity analysis: potentials, distances, levels and the heap are O(V), on top of the network.
+    """
+    head, nxt, to, cap, cost = network.head, network.next, network.to, network.cap, network.cost
+    total_nodes = network.total_nodes
+    infinity = float('inf')
+    potential = [0] * total_nodes
+
+    # Reduced cost shortest distances from the source
+    def dijkstra():
+        dist = [infinity] * total_nodes
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            e = head[u]
+            while e >= 0:
+                if cap[e] > 0:
+                    v = to[e]
+                    new_dist = d + cost[e] + potential[u] - potential[v]
+                    if new_dist < dist[v]:
+                        dist[v] = new_dist
+                        heapq.heappush(heap, (new_dist, v))
+                e = nxt[e]
+        return dist
+
+    # An edge can carry flow in this round if it has capacity and zero reduced cost
+    def admissible(u, e):
+        return cap[e] > 0 and cost[e] + potential[u] - potential[to[e]] == 0
+
+    def bfs_levels():
+        level = [-1] * total_nodes
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            e = head[u]
+            while e >= 0:
+                v = to[e]
+                if level[v] < 0 and admissible(u, e):
+                    level[v] = level[u] + 1
+                    queue.append(v)
+                e = nxt[e]
+        return level
+
+    total_flow = 0
+    total_cost = 0
+    while True:
+        dist = dijkstra()
+        if dist[sink] == infinity:
+            break
+        # nodes further than the sink only move by the sink's distance, which keeps reduced costs non negative
+        for v in range(total_nodes):
+            potential[v] += min(dist[v], dist[sink])
+        # every path of zero reduced cost edges costs potential[sink] - potential[source] per unit
+        path_cost = potential[sink] - potential[source]
+        level = bfs_levels()
+        while level[sink] >= 0:
+            pushed = blocking_flow(network, source, sink, level, admissible)[0]
+            total_flow += pushed
+            total_cost += pushed * path_cost
+            level = bfs_levels()
+
+    return total_flow, total_cost
+
+
+def greedy_seed(network, source, sink, stats=None):
+    """
+        Function description:
+        Warm start for the max flow engines on a network shaped like crowdedCampus's (source -> students or groups
+        -> classes -> sink). Each student, in order, is put straight into their least contended preferred class
+        that still has room, contention being how much capacity wants the class over its max capacity. The flow
+        this pushes is valid, so an engine run afterwards only searches for the students left unmatched.
+
+        :Input:
+        argv1: network - FlowNetwork, flow is pushed into it in place
+        argv2: source - the source node index
+        argv3: sink - the sink node index
+        argv4: stats - optional SolveStats, gets the flow the greedy pass pushed
+        :Output, return or postcondition: the flow value pushed
+        :Time complexity: O(V + E) for students, O(V + E*d) for groups
+        :Time complexity analysis: contention is one pass over the edges, then each student scans its d class edges 
+        once (a group with more capacity rescans them for every class it fills, at most d times)
+        :Space complexity: O(V)
+        :Space complexity analysis: the contention and sink edge lists are per node
+    """
+    head, nxt, to, cap = network.head, network.next, network.to, network.cap
+    total_nodes = network.total_nodes
+
+    # the class -> sink edge of every class, the sink's edges are all reverse edges of those
+    sink_edge = [-1] * total_nodes
+    e = head[sink]
+    while e >= 0:
+        sink_edge[to[e]] = e ^ 1
+        e = nxt[e]
+
+    # contention of each class, how much capacity points at it over its max capacity. Every edge into a 
+    # class is a student (or group) edge, so its the class's reverse edges that are counted
+    contention = [0.0] * total_nodes
+    for c in range(total_nodes):
+        if sink_edge[c] < 0:
+            continue
+        demand = 0
+        f = head[c]
+        while f >= 0:
+            if f & 1:
+                demand += cap[f ^ 1] + cap[f]
+            f = nxt[f]
+        contention[c] = demand / max(cap[sink_edge[c]] + cap[sink_edge[c] ^ 1], 1)
+
+    source_edges = []
+    e = head[source]
+    while e >= 0:
+        source_edges.append(e)
+        e = nxt[e]
+
+    pushed = 0
+    # head order is last added first, go through students in the order they were added
+    for e in reversed(source_edges):
+        while cap[e] > 0:
+            # least contended class with room left
+            best = -1
+            best_contention = 0.0
+            f = head[to[e]]
+            while f >= 0:
+                c = to[f]
+                if not f & 1 and cap[f] > 0 and cap[sink_edge[c]] > 0 and (best < 0 or contention[c] < best_contention):
+                    best = f
+                    best_contention = contention[c]
+                f = nxt[f]
+            if best < 0:
+                break
+            s = sink_edge[to[best]]
+            amount = min(cap[e], cap[best], cap[s])
+            for edge in (e, best, s):
+                cap[edge] -= amount
+                cap[edge ^ 1] += amount
+            pushed += amount
+    if stats is not None:
+        stats.greedy_flow += pushed
+    return pushed
+
+
+# max flow engines crowdedCampus can run phase 1 with, all take a FlowNetwork, source and sink, 
+# leave the residual graph in the network and return the max flow value
+MAX_FLOW_ENGINES = {
+    "dinic": dinic,
+    "dfs": ford_fulkerson_dfs,
+    "bfs": edmonds_karp,
+}
+
+
+def space_efficient_ford_fulkerson(graph, source, sink, stats=None):
+    """
+        Function description:
+        Runs ford_fulkerson_dfs on an adjacency list graph, each node has a list of [neighbor, capacity].
+        Kept for callers that work with lists, crowdedCampus builds a FlowNetwork directly. 
+        stats is an optional SolveStats (see ford_fulkerson_dfs).
+
+        :Output, return or postcondition: residual_graph, lists of [neighbor, residual capacity] (see FlowNetwork.to_residual_graph)
+        :Time complexity: O(n^2), see ford_fulkerson_dfs
+        :Space complexity: O(n)
+    """
+    network = FlowNetwork.from_graph(graph)
+    ford_fulkerson_dfs(network, source, sink, stats)
+    return network.to_residual_graph(graph)
+
+
+def edmonds_karp_max_flow(graph, source, sink, stats=None):
+    """
+        Function description:
+        Runs edmonds_karp on an adjacency list graph, returning the residual graph as lists like space_efficient_ford_fulkerson.
+
+        :Time complexity: O(n^2), see edmonds_karp
+        :Space complexity: O(n)
+    """
+    network = FlowNetwork.from_graph(graph)
+    edmonds_karp(network, source, sink, stats)
+    return network.to_residual_graph(graph)
+
+
+def dinic_max_flow(graph, source, sink, stats=None):
+    """
+        Function description:
+        Runs dinic on an adjacency list graph, returning the residual graph as lists like space_efficient_ford_fulkerson.
+
+        :Time complexity: O(n*sqrt(n)), see dinic
+        :Space complexity: O(n)
+    """
+    network = FlowNetwork.from_graph(graph)
+    dinic(network, source, sink, stats)
+    return network.to_residual_graph(graph)
 
 
 
@@ -1,33 +1,146 @@
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+import struct
+import sys
+
+
 class Bad_AI:
-    def __init__(self, list_words):
+    def __init__(self, list_words, backend="trie"):
         """
         Function description:
-        Builds the prefix trie with the list of words provided.
+        Builds the dictionary index with the list of words provided. The "trie" backend (default) builds one 
+        prefix trie per word length, a substitution never changes the length of a word, so a sus word only ever
+        has to be searched for in the trie of its own length, and words of other lengths can't slow the search down.
+        The "wildcard" backend builds a WildcardIndex instead, lookups are L hash probes rather than a trie 
+        search but it stores every word L times. The "compact" backend builds a CompactTrie, the same trie search
+        on flat arrays, about an order of magnitude less memory than TrieNode objects.
         :Input:
         argv1: list_words: list of str, the words to be inserted into the trie
+        argv2: backend: str, "trie", "wildcard" or "compact"
         :Output, return or postcondition: None
-        :Time complexity: O(C), where C is the total number of characters in all words
+        :Time complexity: O(C) for the tries, O(C * L) for the wildcard index, where C is the total number of
+        characters in all words and L the longest word
         :Time complexity analysis: In the worst case, we have to insert/iterate  over each character of each word into the trie.
-        :Space complexity: O(C)
+        The wildcard index builds L keys of length L per word.
+        :Space complexity: O(C) for the tries, O(C * L) for the wildcard index
         :Space complexity analysis: In the worst case, we have to create a new node for each character of each word in the trie.
         """
-        self.prefixTrie = PrefixTrie()
+        if backend not in ("trie", "wildcard", "compact"):
+            raise ValueError("unknown backend: %r" % (backend,))
+        self.backend = backend
+        self.tries = {}
+        self.wildcardIndex = None
+        self.compactTrie = None
+        if backend == "compact":
+            self.compactTrie = CompactTrie.from_words(list_words)
+            return
+        if backend == "wildcard":
+            self.wildcardIndex = WildcardIndex()
+            for word in list_words:
+                self.wildcardIndex.insert(word)
+            return
         for word in list_words:
-            self.prefixTrie.insert(word)
+            trie = self.tries.get(len(word))
+            if trie is None:
+                trie = PrefixTrie()
+                self.tries[len(word)] = trie
+            trie.insert(word)
         
 
+    @classmethod
+    def load(cls, path):
+        """
+        Function description:
+        A Bad_AI on the "compact" backend with its trie memory mapped from a file written by save, so nothing 
+        is inserted on startup and every process that loads the same file shares its pages.
+        :Time complexity: O(1)
+        :Space complexity: O(1), the trie stays in the page cache
+        """
+        ai = cls([], backend="compact")
+        ai.compactTrie = CompactTrie.load(path)
+        return ai
+
+    def save(self, path):
+        """
+        Function description:
+        Writes the compact trie to path for Bad_AI.load, only the "compact" backend can be saved.
+        """
+        if self.compactTrie is None:
+            raise ValueError("only the compact backend can be saved")
+        self.compactTrie.save(path)
+
+    def close(self):
+        """
+        Function description:
+        Releases the file mapping of a Bad_AI from load, the other backends have nothing to release.
+        """
+        if self.compactTrie is not None:
+            self.compactTrie.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def check_word(self, sus_word):
         """
             (Simplified)
             Function description: Takes in a word and checks if there are any words in our prefix trie that has a levenstein distance of 1 through substitution.
 
-            Complexity is based on modifiedDFS (main function)
+            Only the trie holding words of the same length is searched, if there isn't one nothing can match.
+
+            Complexity is based on modifiedDFS (main function), or the other backend's findWordWithLevenSubDisOne
         """
-        results = self.prefixTrie.findWordWithLevenSubDisOne(sus_word)
+        if self.compactTrie is not None:
+            return self.compactTrie.findWordWithLevenSubDisOne(sus_word)
+        if self.wildcardIndex is not None:
+            return self.wildcardIndex.findWordWithLevenSubDisOne(sus_word)
+        trie = self.tries.get(len(sus_word))
+        if trie is None:
+            return []
+        results = trie.findWordWithLevenSubDisOne(sus_word)
         return results 
 
 
 
+    def check_words(self, sus_words):
+        """
+            Function description: check_word for many words at once, results[k] is check_word(sus_words[k]).
+            Words of the same length are searched together (duplicates only once): one traversal of the trie 
+            carries every query still in the running, so the trie levels their prefixes share are only walked 
+            once instead of once per word. The wildcard backend has no traversal to share and just probes 
+            each word.
+
+            :Input:
+            argv1: sus_words: iterable of str
+            :Output, return or postcondition: list with the result list of each word, in input order
+            :Time complexity: O(T * Q) + O(X) at worst, where T is the trie nodes within reach of the queries and 
+            Q the queries sharing a length, the same bound as one check_word per query, but nodes near the root 
+            are visited once for all of them
+            :Space complexity: O(Q * J + X), the active queries on each level of the traversal plus the results
+        """
+        sus_words = list(sus_words)
+        if self.wildcardIndex is not None:
+            return [self.wildcardIndex.findWordWithLevenSubDisOne(word) for word in sus_words]
+
+        by_length = {}
+        for word in dict.fromkeys(sus_words):
+            by_length.setdefault(len(word), []).append(word)
+        found = {}
+        for length, words in by_length.items():
+            if self.compactTrie is not None:
+                group_results = self.compactTrie.findWordsWithLevenSubDisOne(words)
+            elif length in self.tries:
+                group_results = self.tries[length].findWordsWithLevenSubDisOne(words)
+            else:
+                group_results = [[] for _ in words]
+            found.update(zip(words, group_results))
+        return [list(found[word]) for word in sus_words]
+
+
 """
 Node class to be used in the Trie structure.
 """
@@ -35,6 +148,10 @@ class TrieNode:
     def __init__(self):
         self.children = [None] * 26
         self.is_end_of_word = False
+        # length of the shortest and longest word ending below this node, counted from this node
+        # (0 if a word ends here), -1 until a word goes through it
+        self.min_remaining = -1
+        self.max_remaining = -1
 
 
 """
@@ -57,19 +174,36 @@ class PrefixTrie:
         :Space complexity analysis: Worst case we have to a create a new node for each character of the word
         """
         node = self.root
+        remaining = len(word)
         for char in word:
+            PrefixTrie.update_remaining(node, remaining)
             index = ord(char) - ord('a')
             if node.children[index] is None:
                 node.children[index] = TrieNode()
             node = node.children[index]
+            remaining -= 1
+        PrefixTrie.update_remaining(node, 0)
         node.is_end_of_word = True
+
+    def update_remaining(node, remaining):
+        """
+        Function description:
+        Records that a word ends remaining characters below node.
+        :Time complexity: O(1)
+        :Space complexity: O(1)
+        """
+        if node.min_remaining < 0 or remaining < node.min_remaining:
+            node.min_remaining = remaining
+        if remaining > node.max_remaining:
+            node.max_remaining = remaining
     
     def modifiedDFS(node, current_depth, depth, word, substitutionUsed, current_word, results):
         """
             Approach description (if main function):
 
             This modifed dfs searches the prefix trie up to the depth of the sus word length.
-            It checks all branches of the trie from the root node to the depth. 
+            It checks the branches of the trie from the root node to the depth, skipping any child where no
+            word below it ends exactly at the depth (its min/max remaining length doesnt cover what's left). 
             Each level of the trie corresponds to a character in the sus word at the same index, we 
             then check if these two characters match, if they dont we make our one substituion, if not we contiune.
             We do this till we hit the depth, where we make our final checks of if we are at the end of a word, and if we used our one substitution.
@@ -112,9 +246,11 @@ class PrefixTrie:
             return results
         
         #runs like normal recursive dfs where we search all neighbours of the current node, through the 
-        #call stack
+        #call stack, children whose words are all too short or too long for the sus word are skipped
+        needed = depth - current_depth - 1
         for i in range(len(node.children)):
-            if node.children[i] is not None:
+            child = node.children[i]
+            if child is not None and child.min_remaining <= needed <= child.max_remaining:
                 #we grab the child and check if it matches the same index character of the sus word
                 next_char = chr(i + ord('a'))
                 if i != ord(word[current_depth]) - ord('a'):
@@ -122,18 +258,73 @@ class PrefixTrie:
                     #their results array at the base cases, either when we hit a word 
                     if not substitutionUsed:
                         # substitution
-                        PrefixTrie.modifiedDFS(node.children[i],
+                        PrefixTrie.modifiedDFS(child,
                                     current_depth + 1, depth, word, 
                                     True, current_word + next_char, results)
                 else:
                     # Match - continue without substitution
-                    PrefixTrie.modifiedDFS(node.children[i],
+                    PrefixTrie.modifiedDFS(child,
                                 current_depth + 1, depth, word,
                                 substitutionUsed, current_word + next_char, results)
         return results
 
 
 
+    def sharedDFS(node, current_depth, depth, words, active, current_word, results):
+        """
+            Function description:
+            modifiedDFS for many sus words of the same length at once. active holds (query index, 
+            substitutionUsed) for every word the branch so far is still valid for, each child only carries 
+            on the words it matches or can be the one substitution for, and a branch no word can follow is 
+            never entered. At the depth, the branch is a result for every active word that used its substitution.
+
+            :Input:
+            argv1: node: TrieNode, the current node we are exploring
+            argv2: current_depth: int, the current level depth in the trie
+            argv3: depth: int, the length of the sus words
+            argv4: words: list of str, the sus words
+            argv5: active: list of (int, bool), the words still matching this branch and if they used their substitution
+            argv6: current_word: str, the branch so far
+            argv7: results: list of lists, results[q] gets the matches of words[q] in lexicographic order
+            :Output, return or postcondition: results
+            :Time complexity: O(J * N * Q) + O(X) at worst, like modifiedDFS per word, but shared prefixes are walked once
+            :Space complexity: O(J * Q + X)
+        """
+        if current_depth == depth:
+            if node.is_end_of_word:
+                for q, substitutionUsed in active:
+                    if substitutionUsed:
+                        results[q].append(current_word)
+            return results
+
+        needed = depth - current_depth - 1
+        for i in range(len(node.children)):
+            child = node.children[i]
+            if child is not None and child.min_remaining <= needed <= child.max_remaining:
+                next_char = chr(i + ord('a'))
+                next_active = []
+                for q, substitutionUsed in active:
+                    if words[q][current_depth] == next_char:
+                        next_active.append((q, substitutionUsed))
+                    elif not substitutionUsed:
+                        next_active.append((q, True))
+                if next_active:
+                    PrefixTrie.sharedDFS(child, current_depth + 1, depth, words, next_active,
+                                         current_word + next_char, results)
+        return results
+
+    def findWordsWithLevenSubDisOne(self, words):
+        """
+        Function description:
+        findWordWithLevenSubDisOne for a list of sus words that all have the same length, in one traversal.
+        :Output, return or postcondition: list of result lists, one per word
+        """
+        if not words:
+            return []
+        results = [[] for _ in words]
+        active = [(q, False) for q in range(len(words))]
+        return PrefixTrie.sharedDFS(self.root, 0, len(words[0]), words, active, "", results)
+
     def findWordWithLevenSubDisOne(self, word):
         """
         (Simplified)
@@ -147,4 +338,350 @@ class PrefixTrie:
         #no need for visited, a prefix trie doesnt have cycles at all
         return PrefixTrie.modifiedDFS(node, 0, depth, word, False, "", results)
 
-    
+
+
+"""
+Hash index of every word with one position masked, an alternative to the prefix trie.
+"""
+class WildcardIndex:
+    def __init__(self):
+        # "c*t" -> every word that is c, any letter, t, in insertion order
+        self.buckets = {}
+        self.words = set()
+
+    def keys(word):
+        """
+        Function description:
+        The wildcard keys of a word, one per position with that position replaced by *.
+        :Time complexity: O(L^2), where L is the length of the word
+        :Space complexity: O(L^2)
+        """
+        return [word[:i] + "*" + word[i + 1:] for i in range(len(word))]
+
+    def insert(self, word):
+        """
+        Function description:
+        Adds a word to the bucket of each of its wildcard keys, words already in the index are skipped.
+        :Input:
+        argv1: word: str, the word to be inserted
+        :Output, return or postcondition: None
+        :Time complexity: O(L^2), where L is the length of the word
+        :Time complexity analysis: L keys of length L are built and hashed
+        :Space complexity: O(L^2)
+        :Space complexity analysis: the word is stored in L buckets, each new key costs O(L)
+        """
+        if word in self.words:
+            return
+        self.words.add(word)
+        for key in WildcardIndex.keys(word):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = [word]
+            else:
+                bucket.append(word)
+
+    def findWordWithLevenSubDisOne(self, word):
+        """
+        Function description:
+        Finds the words with exactly one substitution from word. A word in the bucket of the key masking 
+        position i matches word everywhere but i, so it's one substitution away unless it's word itself, and it 
+        can't be in any other key's bucket for this word. Sorted, so the results come in the same order as the 
+        prefix trie's.
+        :Input:
+        argv1: word: str, the sus word
+        :Output, return or postcondition: list of the matching words in lexicographic order
+        :Time complexity: O(L^2 + X log X), where X is the number of results
+        :Time complexity analysis: L probes each hashing a key of length L, then the results are sorted
+        :Space complexity: O(L + X)
+        """
+        results = []
+        for key in WildcardIndex.keys(word):
+            for candidate in self.buckets.get(key, ()):
+                if candidate != word:
+                    results.append(candidate)
+        results.sort()
+        return results
+
+
+
+"""
+Prefix trie in flat arrays, an alternative to the TrieNode objects.
+"""
+class CompactTrie:
+    # min_remaining of a node no word goes through, so no search depth fits it
+    NO_WORDS = 0xFFFF
+
+    def __init__(self, child_start, labels, terminal, min_remaining, max_remaining):
+        """
+        Nodes are numbered in BFS order with each node's children in label order, so the children of node u
+        are exactly the nodes child_start[u] to child_start[u + 1] - 1 (CSR form) and nothing has to point at
+        its children. Node 0 is the root.
+        child_start: array('i') of nodes + 1 offsets
+        labels: array('B') letter of the edge into each node, 0 for a to 25 for z
+        terminal: bytearray bitset, bit u is set if a word ends at node u
+        min_remaining, max_remaining: array('H') shortest and longest word below each node, counted from it
+        """
+        self.child_start = child_start
+        self.labels = labels
+        self.terminal = terminal
+        self.min_remaining = min_remaining
+        self.max_remaining = max_remaining
+        # set by load, the file mapping the arrays are memoryviews into and those views
+        self.mapped = None
+        self.views = []
+
+    @classmethod
+    def from_words(cls, list_words):
+        """
+        Function description:
+        Builds the trie level by level from the sorted words. At depth d every word still going has a node 
+        at depth d, and because the words are sorted the words under one node are next to each other, in 
+        order of their next letter, so a new child is made whenever (node, next letter) changes from the word 
+        before. That numbers the nodes in BFS order with contiguous sorted children, as CSR needs.
+        :Input:
+        argv1: list_words: list of str, lowercase a to z words, duplicates are fine
+        :Output, return or postcondition: CompactTrie
+        :Time complexity: O(C + N log N), where C is the total number of characters and N the number of words
+        :Time complexity analysis: sorting, then every character of every word is looked at once
+        :Space complexity: O(C) while building, the trie itself is about 9 bytes per node
+        """
+        words = sorted(set(list_words))
+        node_of_word = [0] * len(words)
+        parent = [0]
+        labels = array('B', [0])
+        terminal_nodes = []
+        min_remaining = [cls.NO_WORDS]
+        max_remaining = [0]
+
+        going = list(range(len(words)))
+        depth = 0
+        while going:
+            still_going = []
+            previous = None
+            for w in going:
+                word = words[w]
+                u = node_of_word[w]
+                remaining = len(word) - depth
+                if remaining < min_remaining[u]:
+                    min_remaining[u] = remaining
+                if remaining > max_remaining[u]:
+                    max_remaining[u] = remaining
+                if remaining == 0:
+                    terminal_nodes.append(u)
+                    continue
+                key = (u, ord(word[depth]) - ord('a'))
+                if key != previous:
+                    previous = key
+                    parent.append(u)
+                    labels.append(key[1])
+                    min_remaining.append(cls.NO_WORDS)
+                    max_remaining.append(0)
+                node_of_word[w] = len(parent) - 1
+                still_going.append(w)
+            going = still_going
+            depth += 1
+
+        nodes = len(parent)
+        # children come right after each other in parent order, so the offsets are a running count
+        child_start = array('i', [0]) * (nodes + 1)
+        for v in range(1, nodes):
+            child_start[parent[v] + 1] += 1
+        child_start[0] = 1
+        for u in range(nodes):
+            child_start[u + 1] += child_start[u]
+
+        terminal = bytearray((nodes + 7) // 8)
+        for u in terminal_nodes:
+            terminal[u >> 3] |= 1 << (u & 7)
+        return cls(child_start, labels, terminal, array('H', min_remaining), array('H', max_remaining))
+
+    # file header: magic, byte order, node count
+    HEADER = struct.Struct("<8sBxxxI")
+    MAGIC = b"CTRIE001"
+
+    def save(self, path):
+        """
+        Function description:
+        Writes the trie as one binary file: the header, then child_start, min_remaining, max_remaining, labels 
+        and terminal as raw native arrays, each section padded to 4 bytes so the loaded views are aligned.
+        :Time complexity: O(nodes)
+        :Space complexity: O(1) extra, the arrays are written as they are
+        """
+        nodes = len(self.labels)
+        # written to a temporary file then renamed, so processes that have the old file mapped keep reading
+        # it instead of having it truncated under them
+        with open(path + ".tmp", "wb") as f:
+            f.write(CompactTrie.HEADER.pack(CompactTrie.MAGIC, sys.byteorder == "little", nodes))
+            for section in (self.child_start, self.min_remaining, self.max_remaining, self.labels, self.terminal):
+                data = bytes(section) if isinstance(section, bytearray) else memoryview(section).tobytes()
+                f.write(data)
+                f.write(bytes(-len(data) % 4))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Function description:
+        Memory maps a file written by save read only, the arrays are memoryviews into the mapping so loading 
+        doesn't read or copy the trie, pages are only touched when a search reaches them.
+        :Time complexity: O(1)
+        :Space complexity: O(1)
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapped) < cls.HEADER.size or mapped[:len(cls.MAGIC)] != cls.MAGIC:
+            mapped.close()
+            raise ValueError("%s is not a compact trie file" % (path,))
+        _, little_endian, nodes = cls.HEADER.unpack_from(mapped)
+        if little_endian != (sys.byteorder == "little"):
+            mapped.close()
+            raise ValueError("%s was written on a machine with the other byte order" % (path,))
+        layout = ((4 * (nodes + 1), 'i'), (2 * nodes, 'H'), (2 * nodes, 'H'), (nodes, 'B'), ((nodes + 7) // 8, 'B'))
+        if len(mapped) != cls.HEADER.size + sum(length + -length % 4 for length, _ in layout):
+            mapped.close()
+            raise ValueError("%s is not a compact trie file" % (path,))
+
+        view = memoryview(mapped)
+        offset = cls.HEADER.size
+        sections = []
+        for length, code in layout:
+            sections.append(view[offset:offset + length].cast(code))
+            offset += length + -length % 4
+        trie = cls(sections[0], sections[3], sections[4], sections[1], sections[2])
+        trie.mapped = mapped
+        trie.views = sections + [view]
+        return trie
+
+    def close(self):
+        """
+        Function description:
+        Releases the file mapping of a loaded trie, if there is one. The trie can't be searched afterwards.
+        """
+        if self.mapped is None:
+            return
+        # the mapping can only be closed once nothing is exported from it, so the views go first
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.mapped.close()
+        self.mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_terminal(self, u):
+        return self.terminal[u >> 3] >> (u & 7) & 1
+
+    def child(self, u, label):
+        """
+        Function description:
+        The child of u along label, or -1. Binary search over u's sorted child labels.
+        :Time complexity: O(log 26) = O(1)
+        """
+        lo, hi = self.child_start[u], self.child_start[u + 1]
+        v = bisect_left(self.labels, label, lo, hi)
+        if v < hi and self.labels[v] == label:
+            return v
+        return -1
+
+    def findWordWithLevenSubDisOne(self, word):
+        """
+        Function description:
+        Same search as PrefixTrie.modifiedDFS, but with an explicit stack and only over the children that 
+        exist. Before the substitution every child whose min/max remaining length covers the rest of word is
+        tried, at the substituted letter the rest of the word has to match exactly, so it's followed 
+        with child() instead of searched. Results are built from word and the substituted letter, not
+        a string per node, and come out in lexicographic order since children are pushed in reverse.
+        :Input:
+        argv1: word: str, the sus word
+        :Output, return or postcondition: list of the matching words in lexicographic order
+        :Time complexity: O(J * N) + O(X), same as modifiedDFS
+        :Space complexity: O(J + X)
+        """
+        depth = len(word)
+        child_start, labels = self.child_start, self.labels
+        min_remaining, max_remaining = self.min_remaining, self.max_remaining
+        letters = [ord(char) - ord('a') for char in word]
+        results = []
+
+        # (node, its depth) for a node that still matches word exactly, or (-1, result) for a found word,
+        # both kept in order on the stack so results come out sorted
+        stack = [(0, 0)]
+        while stack:
+            u, d = stack.pop()
+            if u < 0:
+                results.append(d)
+                continue
+            if d == depth:
+                continue
+            needed = depth - d - 1
+            # reversed so the children come off the stack in label order
+            for v in range(child_start[u + 1] - 1, child_start[u] - 1, -1):
+                if not min_remaining[v] <= needed <= max_remaining[v]:
+                    continue
+                if labels[v] == letters[d]:
+                    stack.append((v, d + 1))
+                    continue
+                # substitute letter d, then the rest has to match
+                x = v
+                for k in range(d + 1, depth):
+                    x = self.child(x, letters[k])
+                    if x < 0:
+                        break
+                if x >= 0 and self.is_terminal(x):
+                    stack.append((-1, word[:d] + chr(labels[v] + ord('a')) + word[d + 1:]))
+        return results
+
+    def findWordsWithLevenSubDisOne(self, words):
+        """
+        Function description:
+        findWordWithLevenSubDisOne for a list of sus words that all have the same length, in one traversal. 
+        Each stack entry carries the words that still match its branch exactly, so the shared levels are 
+        walked once. When a word substitutes a letter the rest of it has to match exactly, which is 
+        followed with child() straight away like the single word search, rather than carried down the stack.
+        :Output, return or postcondition: list of result lists, one per word, each in lexicographic order
+        :Time complexity: O(T * Q) + O(X log X) at worst, T trie nodes within reach and Q words
+        :Space complexity: O(J * Q + X)
+        """
+        results = [[] for _ in words]
+        if not words:
+            return results
+        depth = len(words[0])
+        child_start, labels = self.child_start, self.labels
+        min_remaining, max_remaining = self.min_remaining, self.max_remaining
+        letters = [[ord(char) - ord('a') for char in word] for word in words]
+
+        # (node, its depth, the words the branch still matches exactly)
+        stack = [(0, 0, list(range(len(words))))]
+        while stack:
+            u, d, active = stack.pop()
+            if d == depth:
+                continue
+            needed = depth - d - 1
+            for v in range(child_start[u], child_start[u + 1]):
+                if not min_remaining[v] <= needed <= max_remaining[v]:
+                    continue
+                label = labels[v]
+                matching = []
+                for q in active:
+                    if letters[q][d] == label:
+                        matching.append(q)
+                        continue
+                    # substitute letter d of word q, then the rest has to match
+                    x = v
+                    for k in range(d + 1, depth):
+                        x = self.child(x, letters[q][k])
+                        if x < 0:
+                            break
+                    if x >= 0 and self.is_terminal(x):
+                        word = words[q]
+                        results[q].append(word[:d] + chr(label + ord('a')) + word[d + 1:])
+                if matching:
+                    stack.append((v, d + 1, matching))
+        # results are found in the order their substituted position is reached, not in word order
+        for found in results:
+            found.sort()
+        return results
@@ -0,0 +1,176 @@
+#BENCHMARK FOR CROWDED CAMPUS Q1
+"""
+Reproducible benchmark harness for crowdedCampus.
+
+Instances come from a seeded generator so the same arguments always give the same students and classes,
+each run times network construction, phase 1 (max flow), phase 2 (min capacity repair) and the full
+crowdedCampus call, records peak memory, and the results are written as JSON so runs can be compared
+across commits.
+
+    python benchmark.py --sizes 1000 10000 100000 --seed 0 --output bench.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from CrowdedCampus import MAX_FLOW_ENGINES, TIME_SLOTS, SolveStats, crowdedCampus
+
+
+def generate_instance(n, m, seed=0, slot_skew=0.0, capacity_tightness=0.8, satisfaction_target=0.5):
+    """
+    Function description:
+    Generates a random crowdedCampus instance. Time slot s gets weight 1/(s+1)^slot_skew, every student ranks
+    all 20 slots by weighted sampling without replacement (so a higher skew makes the early slots everyone's
+    favourites) and the class times are drawn with the same weights.
+
+    :Input:
+    argv1: n: int, number of students
+    argv2: m: int, number of classes, 1 <= m <= n
+    argv3: seed: int, seed for the random generator
+    argv4: slot_skew: float, 0 is uniform, larger values crowd students into the same few slots
+    argv5: capacity_tightness: float in (0, 1], students over total max capacity, 1 means every seat is needed
+    argv6: satisfaction_target: float in [0, 1], minimumSatisfaction as a fraction of n
+    :Output, return or postcondition: (n, m, timePreferences, proposedClasses, minimumSatisfaction)
+    :Time complexity: O(n + m)
+    :Time complexity analysis: each student sorts 20 keys, constant work
+    :Space complexity: O(n + m)
+    :Space complexity analysis: 20 slots per student and 3 values per class
+    """
+    if not 1 <= m <= n:
+        raise ValueError("need 1 <= m <= n")
+    if not 0 < capacity_tightness <= 1:
+        raise ValueError("capacity_tightness must be in (0, 1]")
+    rng = random.Random(seed)
+    weights = [1.0 / (slot + 1) ** slot_skew for slot in range(TIME_SLOTS)]
+    slots = list(range(TIME_SLOTS))
+
+    # weighted sampling without replacement, sort by u^(1/w) (Efraimidis-Spirakis)
+    timePreferences = []
+    for _ in range(n):
+        keys = [rng.random() ** (1.0 / weights[slot]) for slot in slots]
+        timePreferences.append(sorted(slots, key=keys.__getitem__, reverse=True))
+
+    # max capacities share n / tightness seats evenly (never fewer seats than students), 
+    # min capacities take half the even share of n
+    max_capacity = -(-n // m)
+    max_capacity = max(max_capacity, int(n / (m * capacity_tightness) + 0.5))
+    min_capacity = max(1, n // (2 * m))
+    proposedClasses = []
+    for _ in range(m):
+        proposedClasses.append([rng.choices(slots, weights)[0], min_capacity, max_capacity])
+
+    return n, m, timePreferences, proposedClasses, int(n * satisfaction_target)
+
+
+def time_phases(n, m, timePreferences, proposedClasses, minimumSatisfaction, engine="dinic", warm_start=True):
+    """
+    Function description:
+    Times one crowdedCampus call, with the per phase times and counters from its SolveStats.
+
+    :Output, return or postcondition: dict of seconds for "build", "phase1", "phase2" and "total", the
+    SolveStats counters under "stats", and whether crowdedCampus found an allocation
+    :Time complexity: same as crowdedCampus
+    :Space complexity: same as crowdedCampus
+    """
+    stats = SolveStats()
+    start = time.perf_counter()
+    allocation = crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction,
+                               engine=engine, warm_start=warm_start, stats=stats)
+    finished = time.perf_counter()
+    counters = stats.as_dict()
+    phase_seconds = counters.pop("phase_seconds")
+    return {
+        "build": phase_seconds.get("build", 0.0),
+        "phase1": phase_seconds.get("phase1", 0.0),
+        "phase2": phase_seconds.get("phase2", 0.0),
+        "total": finished - start,
+        "stats": counters,
+        "feasible": allocation is not None,
+    }
+
+
+def peak_memory(n, m, timePreferences, proposedClasses, minimumSatisfaction, engine="dinic", warm_start=True):
+    """
+    Function description:
+    Peak bytes allocated by python during one crowdedCampus call, the inputs themselves aren't counted.
+    tracemalloc slows python down a lot so this is a separate run from the timings.
+    :Time complexity: same as crowdedCampus
+    :Space complexity: same as crowdedCampus
+    """
+    tracemalloc.start()
+    try:
+        crowdedCampus(n, m, timePreferences, proposedClasses, minimumSatisfaction, engine=engine, warm_start=warm_start)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(sizes, classes_per_student=0.02, seed=0, slot_skew=0.0, capacity_tightness=0.8,
+                  satisfaction_target=0.5, engine="dinic", warm_start=True, repeats=1, memory=True):
+    """
+    Function description:
+    Benchmarks crowdedCampus on one generated instance per size, m is n * classes_per_student (at least 1).
+    Timings are the best of repeats runs.
+
+    :Output, return or postcondition: dict with the parameters used and one result dict per size
+    """
+    results = []
+    for n in sizes:
+        m = min(n, max(1, int(n * classes_per_student)))
+        instance = generate_instance(n, m, seed, slot_skew, capacity_tightness, satisfaction_target)
+        runs = [time_phases(*instance, engine=engine, warm_start=warm_start) for _ in range(repeats)]
+        result = {"n": n, "m": m}
+        for key in ("build", "phase1", "phase2", "total"):
+            result[key] = min(run[key] for run in runs)
+        result["feasible"] = runs[0]["feasible"]
+        result["stats"] = runs[0]["stats"]
+        if memory:
+            result["peak_memory_bytes"] = peak_memory(*instance, engine=engine, warm_start=warm_start)
+        results.append(result)
+    return {
+        "parameters": {
+            "classes_per_student": classes_per_student,
+            "seed": seed,
+            "slot_skew": slot_skew,
+            "capacity_tightness": capacity_tightness,
+            "satisfaction_target": satisfaction_target,
+            "engine": engine,
+            "warm_start": warm_start,
+            "repeats": repeats,
+        },
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark crowdedCampus on seeded synthetic instances.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--classes-per-student", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slot-skew", type=float, default=0.0)
+    parser.add_argument("--capacity-tightness", type=float, default=0.8)
+    parser.add_argument("--satisfaction-target", type=float, default=0.5)
+    parser.add_argument("--engine", choices=sorted(MAX_FLOW_ENGINES), default="dinic")
+    parser.add_argument("--no-warm-start", action="store_true")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory run")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.classes_per_student, args.seed, args.slot_skew,
+                           args.capacity_tightness, args.satisfaction_target, args.engine,
+                           not args.no_warm_start, args.repeats, not args.no_memory)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#LOADER FOR CROWDED CAMPUS Q1
+"""
+Streaming loader for large timePreferences files.
+
+crowdedCampus only ever reads the first 5 slots of each student's preferences, so the loader keeps just those,
+5 bytes per student in one flat buffer (an n x 5 uint8 table), instead of a python list of 20 ints per student.
+CSV files are read a line at a time, the compact binary format is memory mapped when it's large so opening a
+5M student file costs no memory up front. TopFivePreferences can be passed to crowdedCampus as timePreferences.
+
+    preferences = TopFivePreferences.from_csv("students.csv", binary_path="students.top5")
+    allocation = crowdedCampus(len(preferences), m, preferences, proposedClasses, minimumSatisfaction)
+"""
+import mmap
+import os
+
+from CrowdedCampus import TIME_SLOTS
+
+TOP = 5
+
+# binary files bigger than this are memory mapped instead of read in
+MMAP_THRESHOLD = 1 << 24
+
+
+class TopFivePreferences:
+    """
+    Read only sequence of the students' top 5 time slots, backed by a flat buffer (bytes or mmap, a bytearray
+    is copied to bytes) where student i's slots are bytes 5i to 5i+4. preferences[i] is a 5 byte bytes object,
+    which slices and iterates as ints like the 20 slot lists crowdedCampus normally gets, and slicing the
+    preferences gives a new TopFivePreferences of those students.
+    """
+    def __init__(self, buffer):
+        if len(buffer) % TOP:
+            raise ValueError("buffer length must be a multiple of %d" % TOP)
+        if isinstance(buffer, bytearray):
+            # kept as bytes so students come out as bytes and the preferences stay read only
+            buffer = bytes(buffer)
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.buffer) // TOP
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            # a slice is another TopFivePreferences over a copy of those students' bytes
+            students = range(len(self))[i]
+            if students.step == 1:
+                return TopFivePreferences(self.buffer[TOP * students.start:TOP * students.stop])
+            return TopFivePreferences(b"".join(self.buffer[TOP * k:TOP * k + TOP] for k in students))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("student index out of range")
+        return self.buffer[TOP * i:TOP * i + TOP]
+
+    def __iter__(self):
+        buffer = self.buffer
+        for start in range(0, len(buffer), TOP):
+            yield buffer[start:start + TOP]
+
+    def close(self):
+        """
+        Function description:
+        Releases the file mapping, if there is one. The preferences can't be read afterwards.
+        """
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def from_lists(cls, timePreferences):
+        """
+        Function description:
+        Packs an in memory timePreferences (lists of slots) into the compact form.
+
+        :Time complexity: O(n)
+        :Space complexity: O(n), 5 bytes per student
+        """
+        buffer = bytearray()
+        for line_number, slots in enumerate(timePreferences, 1):
+            buffer += _top_five(slots, line_number)
+        return cls(buffer)
+
+    @classmethod
+    def from_csv(cls, path, binary_path=None):
+        """
+        Function description:
+        Streams students from a CSV file, one student per line with their slots in order of preference (at
+        least 5 of them, the rest are ignored). Blank lines, lines starting with # and a non numeric header
+        line are skipped. With binary_path the top 5 slots are written there as they are read (see save) and
+        the result is memory mapped from it, so memory use doesn't grow with the file. Otherwise they are
+        kept in a bytearray.
+
+        :Input:
+        argv1: path - CSV file of students
+        argv2: binary_path - optional file for the compact binary copy
+        :Output, return or postcondition: TopFivePreferences, raises ValueError naming the line of a bad student
+        :Time complexity: O(n)
+        :Time complexity analysis: each line is parsed once, only its first 5 fields are converted
+        :Space complexity: O(n) bytes without binary_path, O(1) with it (plus the page cache)
+        """
+        with open(path) as source:
+            if binary_path is None:
+                buffer = bytearray()
+                for line_number, slots in _csv_students(source):
+                    buffer += _top_five(slots, line_number)
+                return cls(buffer)
+            # written to a temporary file then renamed, so processes that have the old file mapped keep
+            # reading it instead of having it truncated under them
+            with open(binary_path + ".tmp", "wb") as target:
+                for line_number, slots in _csv_students(source):
+                    target.write(_top_five(slots, line_number))
+            os.replace(binary_path + ".tmp", binary_path)
+        return cls.from_binary(binary_path, mmap_threshold=0)
+
+    @classmethod
+    def from_binary(cls, path, mmap_threshold=MMAP_THRESHOLD):
+        """
+        Function description:
+        Opens a file written by save. Files over mmap_threshold bytes are memory mapped read only, smaller
+        ones are read in, an empty file gives no students.
+
+        :Time complexity: O(1) when mapped, O(n) otherwise
+        :Space complexity: O(1) when mapped, O(n) otherwise
+        """
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            size = f.tell()
+            if size == 0 or size <= mmap_threshold:
+                f.seek(0)
+                return cls(f.read())
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def save(self, path):
+        """
+        Function description:
+        Writes the compact binary format, the raw n x 5 bytes with no header. The file is replaced rather
+        than rewritten in place, so it is safe to save over a file other processes have open.
+        """
+        with open(path + ".tmp", "wb") as f:
+            f.write(self.buffer)
+        os.replace(path + ".tmp", path)
+
+
+def _csv_students(lines):
+    """
+    Function description:
+    Yields (line number, slot strings) for each student line of a CSV file, skipping the header and comments.
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split(",", TOP)
+        if line_number == 1 and not fields[0].strip().isdigit():
+            continue  # header
+        yield line_number, fields[:TOP]
+
+
+def _top_five(slots, line_number):
+    """
+    Function description:
+    The first 5 slots of a student as 5 bytes, checking they are valid time slots.
+    """
+    try:
+        top = [int(slot) for slot in slots[:TOP]]
+    except ValueError:
+        raise ValueError("student on line %d has a slot that isn't a number" % line_number) from None
+    if len(top) != TOP:
+        raise ValueError("student on line %d needs at least %d slots" % (line_number, TOP))
+    if min(top) < 0 or max(top) >= TIME_SLOTS:
+        raise ValueError("student on line %d has a slot outside 0 to %d" % (line_number, TIME_SLOTS - 1))
+    if len(set(top)) != TOP:
+        raise ValueError("student on line %d repeats a slot" % line_number)
+    return bytes(top)
@@ -1,5 +1,5 @@
 import unittest
-from CrowdedCampus import crowdedCampus
+from CrowdedCampus import crowdedCampus, space_efficient_ford_fulkerson, dinic_max_flow, edmonds_karp_max_flow, FlowNetwork
 
 class TestA2(unittest.TestCase):
     def validate_allocation(
@@ -404,4 +404,487 @@ class TestA2(unittest.TestCase):
         proposed_classes = [[0, 4, 10], [5, 1, 10], [6, 3, 10]]
         minimum_satisfaction = 6
         allocation = crowdedCampus(n, m, time_preferences, proposed_classes, minimum_satisfaction)
-        self.validate_allocation(n, m, time_preferences, proposed_classes, minimum_satisfaction, allocation)
\ No newline at end of file
+        self.validate_allocation(n, m, time_preferences, proposed_classes, minimum_satisfaction, allocation)
+
+    def test_engines_same_allocation_quality(self):
+        import random
+
+        random.seed(7)
+        n, m = 40, 6
+        time_preferences = [random.sample(range(20), 20) for _ in range(n)]
+        proposed_classes = [[j * 3, 2, 9] for j in range(m)]
+        min_satisfaction = 10
+        for engine in ("dinic", "dfs", "bfs"):
+            with self.subTest(engine=engine):
+                allocation = crowdedCampus(n, m, time_preferences, proposed_classes, min_satisfaction, engine=engine)
+                if allocation is not None:
+                    self.validate_allocation(n, m, time_preferences, proposed_classes, min_satisfaction, allocation)
+
+    def test_dinic_max_flow_matches_ford_fulkerson(self):
+        import random
+
+        random.seed(11)
+        n, m = 30, 5
+        graph = [[] for _ in range(n + m + 2)]
+        source, sink = n + m, n + m + 1
+        for i in range(n):
+            graph[source].append([i, 1])
+            for j in random.sample(range(m), 2):
+                graph[i].append([n + j, 1])
+        for j in range(m):
+            graph[n + j].append([sink, random.randint(1, 6)])
+        flows = []
+        for max_flow in (space_efficient_ford_fulkerson, dinic_max_flow, edmonds_karp_max_flow):
+            residual = max_flow(graph, source, sink)
+            flows.append(sum(1 for v, capacity in residual[source] if capacity == 0))
+        self.assertEqual(len(set(flows)), 1)
+
+    def test_long_augmenting_path_no_recursion(self):
+        import sys
+
+        # a single path longer than the recursion limit
+        length = sys.getrecursionlimit() + 500
+        graph = [[[u + 1, 1]] for u in range(length)] + [[]]
+        for max_flow in (space_efficient_ford_fulkerson, dinic_max_flow, edmonds_karp_max_flow):
+            with self.subTest(max_flow=max_flow.__name__):
+                residual = max_flow(graph, 0, length)
+                self.assertEqual(residual[0][0][1], 0)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            crowdedCampus(1, 1, [list(range(20))], [[0, 1, 1]], 1, engine="simplex")
+
+    def test_flow_network_reverse_edges(self):
+        # parallel edges and a 2-cycle, every edge e must pair with e ^ 1 going the other way
+        graph = [[[1, 2], [1, 3], [2, 1]], [[0, 4], [2, 5]], []]
+        network = FlowNetwork.from_graph(graph)
+        for u in range(network.total_nodes):
+            e = network.head[u]
+            while e >= 0:
+                self.assertEqual(network.to[e ^ 1], u)
+                e = network.next[e]
+        residual = network.to_residual_graph(graph)
+        self.assertEqual(residual[0], [[1, 2], [1, 3], [2, 1], [1, 0]])
+        self.assertEqual(residual[2], [[0, 0], [1, 0]])
+
+    def test_aggregate_matches_per_student_network(self):
+        import random
+
+        random.seed(3)
+        n, m = 120, 8
+        # only a handful of distinct top 5 sets so students really get grouped
+        slot_sets = [random.sample(range(20), 20) for _ in range(4)]
+        time_preferences = [list(random.choice(slot_sets)) for _ in range(n)]
+        proposed_classes = [[random.randrange(20), 3, 25] for _ in range(m)]
+        expected = crowdedCampus(n, m, time_preferences, proposed_classes, 0)
+        allocation = crowdedCampus(n, m, time_preferences, proposed_classes, 0, aggregate=True)
+        self.assertEqual(expected is None, allocation is None)
+        if allocation is not None:
+            self.validate_allocation(n, m, time_preferences, proposed_classes, 0, allocation)
+
+        # phase 1 on its own must find the same number of satisfied students
+        from CrowdedCampus import match_preferred_classes, match_preferred_classes_aggregated
+        plain = match_preferred_classes(n, m, time_preferences, proposed_classes)
+        grouped = match_preferred_classes_aggregated(n, m, time_preferences, proposed_classes)
+        self.assertEqual(sum(j != -1 for j in plain), sum(j != -1 for j in grouped))
+        counts = [0] * m
+        for i, j in enumerate(grouped):
+            if j != -1:
+                self.assertIn(proposed_classes[j][0], time_preferences[i][:5])
+                counts[j] += 1
+        for j in range(m):
+            self.assertLessEqual(counts[j], proposed_classes[j][2])
+
+    def test_circulation_finds_allocation_repair_misses(self):
+        n, m = 3, 2
+        time_preferences = [
+            [3, 4, 0, 5, 1] + [t for t in range(20) if t not in (3, 4, 0, 5, 1)],
+            [2, 0, 1, 3, 5] + [t for t in range(20) if t not in (2, 0, 1, 3, 5)],
+            [2, 1, 5, 0, 3] + [t for t in range(20) if t not in (2, 1, 5, 0, 3)],
+        ]
+        proposed_classes = [[2, 2, 2], [3, 1, 3]]
+        min_satisfaction = 3
+        allocation = crowdedCampus(n, m, time_preferences, proposed_classes, min_satisfaction, phase2="circulation")
+        self.validate_allocation(n, m, time_preferences, proposed_classes, min_satisfaction, allocation)
+
+        # the repair only options are rejected rather than ignored
+        from CrowdedCampus import Phase1Cache
+        for option in ({"aggregate": True}, {"decompose": True}, {"workers": 2}, {"vectorized": True},
+                       {"cache": Phase1Cache()}):
+            with self.assertRaises(ValueError):
+                crowdedCampus(n, m, time_preferences, proposed_classes, min_satisfaction, phase2="circulation",
+                              **option)
+
+    def test_circulation_is_optimal(self):
+        import itertools
+        import random
+        from CrowdedCampus import allocate_max_satisfaction, max_satisfaction
+
+        random.seed(21)
+        for _ in range(60):
+            n, m = random.randint(1, 5), random.randint(1, 3)
+            time_preferences = [random.sample(range(6), 6) + list(range(6, 20)) for _ in range(n)]
+            proposed_classes = []
+            for _ in range(m):
+                min_cap = random.randint(1, 2)
+                proposed_classes.append([random.randrange(6), min_cap, min_cap + random.randint(0, 3)])
+            best = None
+            for allocation in itertools.product(range(m), repeat=n):
+                counts = [allocation.count(j) for j in range(m)]
+                if all(proposed_classes[j][1] <= counts[j] <= proposed_classes[j][2] for j in range(m)):
+                    satisfied = sum(proposed_classes[allocation[i]][0] in time_preferences[i][:5] for i in range(n))
+                    best = satisfied if best is None else max(best, satisfied)
+            for solve in (allocate_max_satisfaction, max_satisfaction):
+                result = solve(n, m, time_preferences, proposed_classes)
+                if best is None:
+                    self.assertIsNone(result)
+                else:
+                    self.assertEqual(result[0], best)
+                    self.validate_allocation(n, m, time_preferences, proposed_classes, best, result[1])
+
+    def test_campus_allocator_updates(self):
+        import random
+        from CrowdedCampus import CampusAllocator, match_preferred_classes
+
+        random.seed(8)
+        n, m = 30, 4
+        time_preferences = [random.sample(range(8), 8) + list(range(8, 20)) for _ in range(n)]
+        proposed_classes = [[random.randrange(8), 2, 10] for _ in range(m)]
+        allocator = CampusAllocator(n, m, time_preferences, proposed_classes)
+        for step in range(60):
+            action = random.choice(["prefs", "capacity", "add", "drop"])
+            if action == "prefs":
+                i = random.randrange(n)
+                time_preferences[i] = random.sample(range(8), 8) + list(range(8, 20))
+                allocation = allocator.update_preferences(i, time_preferences[i])
+            elif action == "capacity":
+                j = random.randrange(m)
+                proposed_classes[j] = [proposed_classes[j][0], random.randint(0, 3), random.randint(4, 12)]
+                allocation = allocator.set_capacity(j, proposed_classes[j][1], proposed_classes[j][2])
+            elif action == "add":
+                time_preferences.append(random.sample(range(8), 8) + list(range(8, 20)))
+                n += 1
+                allocation = allocator.add_student(time_preferences[-1])
+            else:
+                i = random.randrange(n)
+                time_preferences.pop(i)
+                n -= 1
+                allocation = allocator.drop_student(i)
+
+            with self.subTest(step=step, action=action):
+                # the repaired flow must be a max flow for the current inputs
+                expected = match_preferred_classes(n, m, time_preferences, proposed_classes)
+                preferred = allocator.preferred_assignments()
+                self.assertEqual(preferred.count(-1), expected.count(-1))
+                if allocation is not None:
+                    self.validate_allocation(n, m, time_preferences, proposed_classes, 0, allocation)
+
+    def test_warm_start_keeps_max_flow(self):
+        import random
+        from CrowdedCampus import match_preferred_classes, match_preferred_classes_aggregated
+
+        random.seed(13)
+        n, m = 80, 10
+        time_preferences = [random.sample(range(20), 20) for _ in range(n)]
+        proposed_classes = [[random.randrange(20), 1, random.randint(1, 12)] for _ in range(m)]
+        cold = match_preferred_classes(n, m, time_preferences, proposed_classes, "dinic", warm_start=False)
+        for engine in ("dinic", "dfs", "bfs"):
+            for match in (match_preferred_classes, match_preferred_classes_aggregated):
+                with self.subTest(engine=engine, match=match.__name__):
+                    warm = match(n, m, time_preferences, proposed_classes, engine, warm_start=True)
+                    self.assertEqual(warm.count(-1), cold.count(-1))
+                    counts = [warm.count(j) for j in range(m)]
+                    for j in range(m):
+                        self.assertLessEqual(counts[j], proposed_classes[j][2])
+
+    def test_benchmark_instances(self):
+        from benchmark import generate_instance, run_benchmark
+
+        first = generate_instance(200, 8, seed=4, slot_skew=1.5, capacity_tightness=1.0, satisfaction_target=0.3)
+        self.assertEqual(first, generate_instance(200, 8, seed=4, slot_skew=1.5, capacity_tightness=1.0, satisfaction_target=0.3))
+        n, m, time_preferences, proposed_classes, min_satisfaction = first
+        self.assertEqual(min_satisfaction, 60)
+        for preferences in time_preferences:
+            self.assertEqual(sorted(preferences), list(range(20)))
+        self.assertLessEqual(sum(c[1] for c in proposed_classes), n)
+        self.assertGreaterEqual(sum(c[2] for c in proposed_classes), n)
+
+        report = run_benchmark([50, 100], seed=1, memory=False)
+        self.assertEqual([r["n"] for r in report["results"]], [50, 100])
+        for result in report["results"]:
+            for key in ("build", "phase1", "phase2", "total"):
+                self.assertGreaterEqual(result[key], 0)
+
+    def test_solve_stats(self):
+        from CrowdedCampus import SolveStats
+
+        n, m = 5, 2
+        time_preferences = [list(range(0, 20))] * 5
+        proposed_classes = [[0, 1, 10], [7, 4, 10]]
+        phases = []
+        stats = SolveStats(callback=lambda phase, seconds: phases.append(phase))
+        allocation = crowdedCampus(n, m, time_preferences, proposed_classes, 1, engine="dfs", warm_start=False, stats=stats)
+        self.assertEqual(allocation, crowdedCampus(n, m, time_preferences, proposed_classes, 1, engine="dfs", warm_start=False))
+        self.assertEqual(phases, ["precheck", "build", "phase1", "phase2"])
+        result = stats.as_dict()
+        # every student gets class 0 through its own augmenting path, then 4 are sacrificed to class 1
+        self.assertEqual(result["augmenting_paths"], 5)
+        self.assertEqual(result["searches"], 6)
+        self.assertEqual(result["edge_updates"], 5 * 3 * 2)
+        self.assertEqual(result["sacrifices"], 4)
+        self.assertEqual(result["satisfaction_lost"], 4)
+
+        residual_stats = SolveStats()
+        graph = [[[1, 1]], [[2, 1]], []]
+        space_efficient_ford_fulkerson(graph, 0, 2, residual_stats)
+        self.assertEqual(residual_stats.augmenting_paths, 1)
+        self.assertGreater(residual_stats.nodes_visited, 0)
+
+    def test_solve_campus_batch(self):
+        from CrowdedCampus import SolveStats, solve_campus_batch
+        from benchmark import generate_instance
+
+        instances = [generate_instance(60, 4, seed) for seed in range(7)]
+        instances.append((2, 1, [list(range(20))] * 2, [[0, 3, 3]], 0))    # infeasible
+        expected = [crowdedCampus(*instance, engine="bfs") for instance in instances]
+
+        results = list(solve_campus_batch(instances, workers=0, chunksize=3, engine="bfs"))
+        self.assertEqual([index for index, _, _ in results], list(range(len(instances))))
+        self.assertEqual([allocation for _, allocation, _ in results], expected)
+
+        results = list(solve_campus_batch(iter(instances), workers=2, chunksize=2, engine="bfs"))
+        self.assertEqual([index for index, _, _ in results], list(range(len(instances))))
+        self.assertEqual([allocation for _, allocation, _ in results], expected)
+        self.assertTrue(all(seconds >= 0 for _, _, seconds in results))
+
+        # bad arguments fail on the call, before any result is asked for
+        with self.assertRaises(ValueError):
+            solve_campus_batch(instances, stats=SolveStats())
+        with self.assertRaises(ValueError):
+            solve_campus_batch(instances, chunksize=0)
+
+        results = solve_campus_batch(instances, workers=2, chunksize=3, ordered=False, engine="bfs")
+        self.assertEqual(sorted((index, allocation) for index, allocation, _ in results), list(enumerate(expected)))
+
+    def test_satisfaction_upper_bound(self):
+        from CrowdedCampus import SolveStats, satisfaction_upper_bound, match_preferred_classes
+        from benchmark import generate_instance
+
+        for seed in range(20):
+            n, m, time_preferences, proposed_classes, _ = generate_instance(80, 5, seed, slot_skew=seed % 3)
+            satisfied = n - match_preferred_classes(n, m, time_preferences, proposed_classes).count(-1)
+            # every slot group is checked here, so the bound is the max flow
+            self.assertEqual(satisfaction_upper_bound(n, m, time_preferences, proposed_classes), satisfied)
+            self.assertGreaterEqual(satisfaction_upper_bound(n, m, time_preferences, proposed_classes, exact_slots=0), satisfied)
+
+        # 6 students all want slots 0-4, which only have room for 2, the precheck stops before any network is built
+        phases = []
+        time_preferences = [list(range(20))] * 6
+        proposed_classes = [[0, 1, 1], [4, 1, 1], [10, 1, 4]]
+        self.assertEqual(satisfaction_upper_bound(6, 3, time_preferences, proposed_classes, exact_slots=0), 2)
+        stats = SolveStats(callback=lambda phase, seconds: phases.append(phase))
+        self.assertIsNone(crowdedCampus(6, 3, time_preferences, proposed_classes, 3, stats=stats))
+        self.assertEqual(phases, ["precheck"])
+        self.assertIsNone(crowdedCampus(6, 3, time_preferences, proposed_classes, 3, precheck=False))
+        self.assertIsNotNone(crowdedCampus(6, 3, time_preferences, proposed_classes, 2))
+
+    def test_decomposed_phase1(self):
+        from CrowdedCampus import slot_components, match_preferred_classes, match_preferred_classes_decomposed
+        from benchmark import generate_instance
+
+        # morning students only rank slots 0-4 and 15-19 first, evening students 5-14
+        morning = [[0, 1, 2, 3, 4] + list(range(5, 20))] * 4 + [[15, 16, 17, 18, 19] + list(range(15))] * 2
+        evening = [[5, 6, 7, 8, 9] + list(range(20)[10:]) + list(range(5))] * 3
+        time_preferences = morning[:2] + evening + morning[2:] + [[10, 11, 12, 13, 14] + list(range(10)) + list(range(15, 20))]
+        proposed_classes = [[5, 1, 3], [0, 1, 3], [12, 0, 2], [4, 1, 2], [16, 0, 1]]
+        n = len(time_preferences)
+        components = slot_components(n, 5, time_preferences, proposed_classes)
+        self.assertEqual(sorted(map(sorted, (classes for _, classes in components))), [[0], [1, 3], [2], [4]])
+        self.assertEqual(sum(len(students) for students, _ in components), n)
+        # only one of the 2 students who want slots 15-19 fits in the class at slot 16
+        assignments = match_preferred_classes_decomposed(n, 5, time_preferences, proposed_classes, workers=2)
+        self.assertEqual(assignments, match_preferred_classes_decomposed(n, 5, time_preferences, proposed_classes))
+        self.assertEqual(n - assignments.count(-1), 9)
+        allocation = crowdedCampus(n, 5, time_preferences, proposed_classes, 9, decompose=True, workers=2)
+        self.validate_allocation(n, 5, time_preferences, proposed_classes, 9, allocation)
+
+        for seed in range(10):
+            n, m, time_preferences, proposed_classes, minimum = generate_instance(60, 6, seed, slot_skew=2)
+            satisfied = n - match_preferred_classes(n, m, time_preferences, proposed_classes).count(-1)
+            for aggregate in (False, True):
+                assignments = match_preferred_classes_decomposed(n, m, time_preferences, proposed_classes, aggregate=aggregate)
+                self.assertEqual(n - assignments.count(-1), satisfied)
+                for i, j in enumerate(assignments):
+                    if j >= 0:
+                        self.assertIn(proposed_classes[j][0], time_preferences[i][:5])
+            allocation = crowdedCampus(n, m, time_preferences, proposed_classes, minimum, decompose=True, workers=2)
+            if allocation is not None:
+                self.validate_allocation(n, m, time_preferences, proposed_classes, minimum, allocation)
+            self.assertEqual(allocation is None, crowdedCampus(n, m, time_preferences, proposed_classes, minimum) is None)
+
+    def test_top_five_loader(self):
+        import os
+        import tempfile
+        from campus_loader import TopFivePreferences
+        from benchmark import generate_instance
+
+        n, m, time_preferences, proposed_classes, minimum = generate_instance(200, 8, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "students.csv")
+            with open(csv_path, "w") as f:
+                f.write("s1,s2,s3,s4,s5,rest\n")
+                for slots in time_preferences:
+                    f.write(",".join(map(str, slots)) + "\n")
+                    f.write("\n")
+
+            in_memory = TopFivePreferences.from_csv(csv_path)
+            self.assertEqual(len(in_memory), n)
+            self.assertEqual([list(slots) for slots in in_memory], [slots[:5] for slots in time_preferences])
+            expected = crowdedCampus(n, m, time_preferences, proposed_classes, minimum)
+            self.assertEqual(crowdedCampus(len(in_memory), m, in_memory, proposed_classes, minimum), expected)
+
+            binary_path = os.path.join(directory, "students.top5")
+            with TopFivePreferences.from_csv(csv_path, binary_path=binary_path) as mapped:
+                self.assertEqual(os.path.getsize(binary_path), 5 * n)
+                self.assertEqual(list(mapped[-1]), time_preferences[-1][:5])
+                self.assertEqual(crowdedCampus(n, m, mapped, proposed_classes, minimum, aggregate=True),
+                                 crowdedCampus(n, m, time_preferences, proposed_classes, minimum, aggregate=True))
+            self.assertEqual(TopFivePreferences.from_binary(binary_path).buffer, in_memory.buffer)
+            self.assertEqual(TopFivePreferences.from_lists(time_preferences).buffer, in_memory.buffer)
+            self.assertIs(type(in_memory[0]), bytes)
+            self.assertIs(type(TopFivePreferences.from_lists(time_preferences)[0]), bytes)
+            # saving over a mapped file replaces it, the mapping keeps reading the old students
+            with TopFivePreferences.from_binary(binary_path, mmap_threshold=0) as mapped:
+                in_memory[:1].save(binary_path)
+                self.assertEqual(len(mapped), n)
+                self.assertEqual(list(mapped[-1]), time_preferences[-1][:5])
+            self.assertEqual(os.path.getsize(binary_path), 5)
+            top_five = [slots[:5] for slots in time_preferences]
+            for students in (slice(0, 2), slice(-3, None), slice(None, None, 7), slice(5, 1, -2), slice(10, 10)):
+                self.assertEqual([list(slots) for slots in in_memory[students]], top_five[students])
+
+            with open(csv_path, "w") as f:
+                f.write("1,2,3,4,20\n")
+            with self.assertRaises(ValueError):
+                TopFivePreferences.from_csv(csv_path)
+
+    def test_vectorized_network(self):
+        from CrowdedCampus import (np, build_campus_network, build_campus_network_numpy, dinic, extract_assignments,
+                                   extract_assignments_numpy)
+        from benchmark import generate_instance
+
+        with self.assertRaises(ValueError):
+            crowdedCampus(5, 1, [list(range(20))] * 5, [[0, 1, 5]], 0, aggregate=True, vectorized=True)
+        with self.assertRaises(ValueError):
+            crowdedCampus(5, 1, [list(range(20))] * 5, [[0, 1, 5]], 0, decompose=True, vectorized=True)
+        if np is None:
+            with self.assertRaises(ImportError):
+                crowdedCampus(5, 1, [list(range(20))] * 5, [[0, 1, 5]], 0, vectorized=True)
+            self.skipTest("numpy is not installed")
+
+        self.assertEqual(crowdedCampus(0, 0, [], [], 0, vectorized=True), crowdedCampus(0, 0, [], [], 0))
+
+        for seed in range(5):
+            n, m, time_preferences, proposed_classes, minimum = generate_instance(100, 7, seed, slot_skew=1)
+            network, source, sink = build_campus_network(n, m, time_preferences, proposed_classes)
+            vectorized, vectorized_source, vectorized_sink = build_campus_network_numpy(n, m, time_preferences, proposed_classes)
+            self.assertEqual((vectorized_source, vectorized_sink), (source, sink))
+            for name in ("head", "next", "to", "cap"):
+                self.assertEqual(getattr(vectorized, name), getattr(network, name))
+            dinic(network, source, sink)
+            self.assertEqual(extract_assignments_numpy(network, n, m), extract_assignments(network, n))
+            self.assertEqual(crowdedCampus(n, m, time_preferences, proposed_classes, minimum, vectorized=True),
+                             crowdedCampus(n, m, time_preferences, proposed_classes, minimum))
+
+    def test_repair_takes_lowest_index_donors(self):
+        from CrowdedCampus import SolveStats, repair_min_capacity
+
+        # classes 0 and 1 are over their min, classes 2 and 3 are short, student 7 is unmatched
+        time_preferences = [[0, 1, 2, 3, 4] + list(range(5, 20))] * 8
+        proposed_classes = [[0, 1, 3], [1, 2, 4], [2, 2, 2], [10, 1, 2]]
+        assignments = [1, 0, 1, 0, 1, 0, 1, -1]
+        stats = SolveStats()
+        satisfied = repair_min_capacity(8, 4, time_preferences, proposed_classes, assignments, 7, stats)
+        # student 7 goes to class 2, then the lowest index students in a class with spare room are moved,
+        # student 0 (class 1) to class 2 and student 1 (class 0) to class 3, only slot 10 costs satisfaction
+        self.assertEqual(assignments, [2, 3, 1, 0, 1, 0, 1, 2])
+        self.assertEqual(satisfied, 6)
+        self.assertEqual((stats.unassigned_placed, stats.sacrifices, stats.satisfaction_lost), (1, 2, 1))
+
+    def test_phase1_cache(self):
+        import tempfile
+        from CrowdedCampus import Phase1Cache, SolveStats
+        from benchmark import generate_instance
+
+        n, m, time_preferences, proposed_classes, _ = generate_instance(150, 6, 4)
+        cache = Phase1Cache(maxsize=2)
+        for minimum in (0, 50, 100, 150):
+            self.assertEqual(crowdedCampus(n, m, time_preferences, proposed_classes, minimum, precheck=False, cache=cache),
+                             crowdedCampus(n, m, time_preferences, proposed_classes, minimum))
+        self.assertEqual((cache.misses, cache.hits), (1, 3))
+
+        # min capacities don't change phase 1, max capacities and options do
+        stats = SolveStats()
+        changed_min = [[slot, 0, max_capacity] for slot, _, max_capacity in proposed_classes]
+        crowdedCampus(n, m, time_preferences, changed_min, 0, cache=cache, stats=stats)
+        self.assertEqual(cache.hits, 4)
+        self.assertNotIn("phase1", stats.phase_seconds)
+        crowdedCampus(n, m, time_preferences, proposed_classes, 0, engine="bfs", cache=cache)
+        changed_max = [[slot, min_capacity, max_capacity + 1] for slot, min_capacity, max_capacity in proposed_classes]
+        crowdedCampus(n, m, time_preferences, changed_max, 0, cache=cache)
+        self.assertEqual((cache.misses, cache.hits, len(cache.entries)), (3, 4, 2))
+        # the dinic result was least recently used so it's gone
+        crowdedCampus(n, m, time_preferences, proposed_classes, 0, cache=cache)
+        self.assertEqual(cache.misses, 4)
+
+        with tempfile.TemporaryDirectory() as directory:
+            expected = crowdedCampus(n, m, time_preferences, proposed_classes, 60)
+            self.assertEqual(crowdedCampus(n, m, time_preferences, proposed_classes, 60, cache=Phase1Cache(directory=directory)), expected)
+            restarted = Phase1Cache(directory=directory)
+            self.assertEqual(crowdedCampus(n, m, time_preferences, proposed_classes, 60, cache=restarted), expected)
+            self.assertEqual((restarted.misses, restarted.hits), (0, 1))
+
+    def test_max_satisfaction_skips_min_cost_flow_when_repair_is_optimal(self):
+        from CrowdedCampus import SolveStats, max_satisfaction
+        from benchmark import generate_instance
+
+        n, m, time_preferences, proposed_classes, _ = generate_instance(300, 6, 2)
+        stats = SolveStats()
+        satisfied, allocation = max_satisfaction(n, m, time_preferences, proposed_classes, stats=stats)
+        self.assertNotIn("circulation", stats.phase_seconds)
+        self.validate_allocation(n, m, time_preferences, proposed_classes, satisfied, allocation)
+        self.assertIsNone(crowdedCampus(n, m, time_preferences, proposed_classes, satisfied + 1))
+
+        # both students fit in class 0 but class 1 needs one of them, the repair loses satisfaction so the
+        # answer comes from the min cost flow
+        time_preferences = [list(range(20))] * 2
+        proposed_classes = [[0, 1, 2], [19, 1, 1]]
+        stats = SolveStats()
+        satisfied, allocation = max_satisfaction(2, 2, time_preferences, proposed_classes, stats=stats)
+        self.assertIn("circulation", stats.phase_seconds)
+        self.assertEqual((satisfied, sorted(allocation)), (1, [0, 1]))
+        self.assertIsNone(max_satisfaction(2, 2, time_preferences, [[0, 1, 1], [19, 2, 2]]))
+
+    def test_solve_within_budget(self):
+        from CrowdedCampus import solve_within_budget
+        from benchmark import generate_instance
+
+        n, m, time_preferences, proposed_classes, minimum = generate_instance(400, 8, 6, slot_skew=2)
+        expected = crowdedCampus(n, m, time_preferences, proposed_classes, minimum)
+        for engine in ("dinic", "dfs", "bfs"):
+            allocation, proven = solve_within_budget(n, m, time_preferences, proposed_classes, minimum, 60, engine)
+            self.assertEqual(allocation, crowdedCampus(n, m, time_preferences, proposed_classes, minimum, engine=engine))
+            self.assertEqual(allocation is None, expected is None)
+
+            # no time at all leaves just the greedy seed, still repaired into a full allocation
+            allocation, proven = solve_within_budget(n, m, time_preferences, proposed_classes, 0, 0, engine)
+            self.assertFalse(proven)
+            self.validate_allocation(n, m, time_preferences, proposed_classes, 0, allocation)
+
+        # all 6 students fit in their preferred class, nothing can do better
+        time_preferences = [list(range(20))] * 6
+        allocation, proven = solve_within_budget(6, 2, time_preferences, [[0, 1, 5], [3, 1, 5]], 6, 1)
+        self.assertTrue(proven)
+        self.validate_allocation(6, 2, time_preferences, [[0, 1, 5], [3, 1, 5]], 6, allocation)
+        self.assertEqual(solve_within_budget(6, 2, time_preferences, [[0, 1, 2], [3, 1, 2]], 0, 1), (None, True))
+        self.assertEqual(solve_within_budget(6, 1, time_preferences, [[19, 1, 6]], 1, 1), (None, True))
@@ -64,5 +64,118 @@ class TestTypo(unittest.TestCase):
                 self.assertCountEqual(result, exp)
                 self.assertEqual(result, exp)
 
+    def test_mixed_lengths_match_brute_force(self):
+        import random
+        random.seed(3)
+        words = sorted({"".join(random.choice("abc") for _ in range(random.randint(1, 7))) for _ in range(400)})
+        ai = Bad_AI(words)
+        self.assertEqual(sorted(ai.tries), sorted({len(word) for word in words}))
+        for _ in range(200):
+            sus = "".join(random.choice("abcd") for _ in range(random.randint(0, 8)))
+            expected = [word for word in words
+                        if len(word) == len(sus) and sum(a != b for a, b in zip(word, sus)) == 1]
+            self.assertEqual(ai.check_word(sus), expected)
+
+    def test_remaining_depth_pruning(self):
+        from Typo import PrefixTrie
+        trie = PrefixTrie()
+        for word in ["ab", "abcdef", "xbcd"]:
+            trie.insert(word)
+        self.assertEqual((trie.root.min_remaining, trie.root.max_remaining), (2, 6))
+        a = trie.root.children[0]
+        self.assertEqual((a.min_remaining, a.max_remaining), (1, 5))
+        # the search for "abcd" stops at "abc", the only word below it is 6 letters
+        self.assertEqual(trie.findWordWithLevenSubDisOne("abcd"), ["xbcd"])
+        self.assertEqual(trie.findWordWithLevenSubDisOne("zb"), ["ab"])
+
+    def test_wildcard_backend_matches_trie(self):
+        import random
+        random.seed(5)
+        words = ["".join(random.choice("abc") for _ in range(random.randint(0, 6))) for _ in range(500)]
+        trie_ai = Bad_AI(words)
+        wildcard_ai = Bad_AI(words, backend="wildcard")
+        self.assertEqual(wildcard_ai.check_word(""), [])
+        for _ in range(300):
+            sus = "".join(random.choice("abcd") for _ in range(random.randint(0, 7)))
+            self.assertEqual(wildcard_ai.check_word(sus), trie_ai.check_word(sus))
+        self.assertEqual(Bad_AI(["dog", "dig", "dag", "dot"], backend="wildcard").check_word("dog"), ["dag", "dig", "dot"])
+        with self.assertRaises(ValueError):
+            Bad_AI(words, backend="hash")
+
+    def test_compact_backend_matches_trie(self):
+        import random
+        from Typo import CompactTrie
+        random.seed(7)
+        words = ["".join(random.choice("abcz") for _ in range(random.randint(0, 7))) for _ in range(600)]
+        trie_ai = Bad_AI(words)
+        compact_ai = Bad_AI(words, backend="compact")
+        for _ in range(300):
+            sus = "".join(random.choice("abcdz") for _ in range(random.randint(0, 8)))
+            self.assertEqual(compact_ai.check_word(sus), trie_ai.check_word(sus))
+
+        trie = CompactTrie.from_words(["to", "tea", "ted", "ten", "i", "in", "inn"])
+        # BFS order: root, i, t, in, te, to, inn, tea, ted, ten
+        self.assertEqual(list(trie.labels), [0, 8, 19, 13, 4, 14, 13, 0, 3, 13])
+        self.assertEqual(list(trie.child_start), [1, 3, 4, 6, 7, 10, 10, 10, 10, 10, 10])
+        self.assertEqual([u for u in range(10) if trie.is_terminal(u)], [1, 3, 5, 6, 7, 8, 9])
+        self.assertEqual(Bad_AI([], backend="compact").check_word("a"), [])
+
+    def test_saved_compact_trie(self):
+        import os
+        import random
+        import tempfile
+        random.seed(11)
+        words = ["".join(random.choice("abc") for _ in range(random.randint(0, 6))) for _ in range(300)]
+        compact_ai = Bad_AI(words, backend="compact")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "words.ctrie")
+            compact_ai.save(path)
+            with Bad_AI.load(path) as loaded:
+                for _ in range(200):
+                    sus = "".join(random.choice("abcd") for _ in range(random.randint(0, 7)))
+                    self.assertEqual(loaded.check_word(sus), compact_ai.check_word(sus))
+            self.assertIsNone(loaded.compactTrie.mapped)
+            loaded = Bad_AI.load(path)
+            self.assertEqual(loaded.check_word("dog"), compact_ai.check_word("dog"))
+            # rebuilding the file replaces it, the loaded trie keeps reading the old one
+            Bad_AI(["dog"], backend="compact").save(path)
+            self.assertEqual(loaded.check_word("dog"), compact_ai.check_word("dog"))
+            self.assertEqual(loaded.check_word("aaa"), compact_ai.check_word("aaa"))
+            loaded.close()
+            with Bad_AI.load(path) as rebuilt:
+                self.assertEqual(rebuilt.check_word("dot"), ["dog"])
+            compact_ai.save(path)
+            loaded.close()
+
+            with self.assertRaises(ValueError):
+                Bad_AI(words).save(path)
+            bad_path = os.path.join(directory, "bad.ctrie")
+            with open(bad_path, "wb") as f:
+                f.write(b"not a trie file at all")
+            with self.assertRaises(ValueError):
+                Bad_AI.load(bad_path)
+            with open(path, "rb") as f:
+                data = f.read()
+            for size in (30, 20, len(data) - 4):
+                with open(bad_path, "wb") as f:
+                    f.write(data[:size])
+                with self.assertRaises(ValueError):
+                    Bad_AI.load(bad_path)
+
+    def test_check_words_matches_check_word(self):
+        import random
+        random.seed(13)
+        words = ["".join(random.choice("abc") for _ in range(random.randint(0, 6))) for _ in range(400)]
+        sus_words = ["".join(random.choice("abcd") for _ in range(random.randint(0, 7))) for _ in range(300)]
+        sus_words += sus_words[:20]
+        for backend in ("trie", "wildcard", "compact"):
+            ai = Bad_AI(words, backend=backend)
+            self.assertEqual(ai.check_words(iter(sus_words)), [ai.check_word(sus) for sus in sus_words])
+        ai = Bad_AI(["dog", "dig", "dag", "dot"])
+        results = ai.check_words(["dog", "dig", "cat", "dog"])
+        self.assertEqual(results, [["dag", "dig", "dot"], ["dag", "dog"], [], ["dag", "dig", "dot"]])
+        self.assertIsNot(results[0], results[3])
+        self.assertEqual(ai.check_words([]), [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file